@@ -0,0 +1,138 @@
+"""
+Wheel angles for a whole fleet of rovers with different geometries in one vectorized call, instead of
+a RoverWheelAngleCalculator per rover and a Python loop over them every tick.
+
+    fleet = FleetWheelAngleCalculator([
+        RoverGeometry(distance_between_front_wheels=7, distance_between_front_pivots=7, distance_between_axels=10),
+        RoverGeometry(distance_between_front_wheels=243.5, distance_between_front_pivots=243.5,
+                      distance_between_axels=131, joystick_range=(-50, 50)),
+    ])
+    wheel_angles = fleet.get_wheel_angles([-30, 12.5])  # shape (2, 4), one row per rover
+
+Every geometry constant is stored struct-of-arrays style, one numpy array with an entry per rover, so
+the per tick cost is a fixed number of numpy operations no matter how big the fleet is.
+"""
+import numpy as np
+import rover_geometry
+import rover_wheel_angle_calculator
+
+
+class FleetWheelAngleCalculator:
+    """
+    Same semantics as RoverWheelAngleCalculator.get_wheel_angles (per rover clamping to its own
+    joystick_range, left/right/center, theta_max/phi_max limits, linear or log input_scale, NaN joystick
+    values not turning), for many rovers at once.
+    """
+
+    def __init__(self, geometries):
+        """
+        :param geometries: list of RoverGeometry, RoverWheelAngleCalculator, or dicts of
+            RoverGeometry arguments; one per rover, in the order joystick values are given
+        """
+        self.set_geometries(geometries)
+        return
+
+    def set_geometries(self, geometries):
+        """
+        Replace the whole fleet and rebuild the geometry arrays.
+        :param geometries: see __init__
+        :return:
+        """
+        fleet = []
+        for geometry in geometries:
+            if isinstance(geometry, dict):
+                geometry = rover_geometry.RoverGeometry(**geometry)
+            elif not isinstance(geometry, rover_geometry.RoverGeometry):
+                # a RoverWheelAngleCalculator
+                geometry = geometry.geometry
+            fleet.append(geometry)
+        if not fleet:
+            raise Exception("Error: a fleet needs at least one rover.")
+        self.geometries = fleet
+        self.num_rovers = len(fleet)
+
+        def fleet_array(get_value):
+            return np.array([get_value(geometry) for geometry in fleet], dtype=np.float64)
+        self.theta_max = fleet_array(lambda geometry: geometry.theta_max)
+        self.phi_max = fleet_array(lambda geometry: geometry.phi_max)
+        self.distance_between_front_pivots = fleet_array(lambda geometry: geometry.distance_between_front_pivots)
+        self.distance_between_axels = fleet_array(lambda geometry: geometry.distance_between_axels)
+        self.wheel_gap_distance = fleet_array(lambda geometry: geometry.wheel_gap_distance)
+        self.joystick_range_min = fleet_array(lambda geometry: geometry.joystick_range[0])
+        self.joystick_range_max = fleet_array(lambda geometry: geometry.joystick_range[1])
+        self.joystick_midpoint = fleet_array(lambda geometry: geometry.joystick_midpoint)
+        self.joystick_range_size = fleet_array(lambda geometry: geometry.joystick_range_size)
+        self.center_point_range_min = fleet_array(lambda geometry: geometry.center_point_range[0])
+        self.center_point_range_size = fleet_array(lambda geometry: geometry.center_point_range_size)
+        self.is_log = np.array([geometry.input_scale == 'log' for geometry in fleet])
+        # linear rovers don't have a log line, 0 keeps exp() harmless for them
+        self.center_point_log_slope = fleet_array(lambda geometry: geometry.center_point_log_slope or 0.0)
+        self.center_point_log_offset = fleet_array(lambda geometry: geometry.center_point_log_offset or 0.0)
+        return
+
+    def set_geometry(self, rover_ix, geometry):
+        """
+        Change one rover's geometry (rebuilds the arrays, so not something to do every tick).
+        :param rover_ix: index of the rover in the fleet
+        :param geometry: see __init__
+        :return:
+        """
+        geometries = list(self.geometries)
+        geometries[rover_ix] = geometry
+        self.set_geometries(geometries)
+        return
+
+    def get_scaled_center_points(self, joystick_vals, is_right):
+        """
+        Fleet version of RoverWheelAngleCalculator.get_scaled_center_point_input_from_joystick_input_batch,
+        each rover scaled by its own input_scale.
+        """
+        center_points = None
+        if not self.is_log.all():
+            center_points = (((joystick_vals - self.joystick_range_min) * self.center_point_range_size)
+                             / self.joystick_range_size) + self.center_point_range_min
+            center_points -= is_right * self.center_point_range_size
+        if self.is_log.any():
+            mirrored_vals = np.where(is_right, (2 * self.joystick_midpoint) - joystick_vals, joystick_vals)
+            log_center_points = np.exp(self.center_point_log_offset + (self.center_point_log_slope * mirrored_vals))
+            if center_points is None:
+                return log_center_points
+            center_points = np.where(self.is_log, log_center_points, center_points)
+        return center_points
+
+    def get_wheel_angles(self, joystick_vals, out=None):
+        """
+        Wheel angles for every rover from its current joystick value.
+        :param joystick_vals: array-like with one joystick value per rover, shape (num_rovers,). More
+            leading dimensions work too, e.g. (num_ticks, num_rovers) for a recorded fleet log.
+        :param out: optional float array of shape joystick_vals.shape + (4,) to write into
+        :return: numpy array of shape joystick_vals.shape + (4,), the last axis being
+            (left_front, right_front, left_back, right_back) like get_wheel_angles
+        """
+        joystick_vals = np.asarray(joystick_vals, dtype=np.float64)
+        if joystick_vals.shape[-1:] != (self.num_rovers,):
+            raise Exception(f"Error: need one joystick value per rover ({self.num_rovers}), "
+                            f"got shape {joystick_vals.shape}.")
+        if out is None:
+            out = np.empty(joystick_vals.shape + (4,), dtype=np.float64)
+        elif out.shape != joystick_vals.shape + (4,):
+            raise Exception(f"Error: out must have shape {joystick_vals.shape + (4,)}, not {out.shape}.")
+        joystick_vals = np.clip(joystick_vals, self.joystick_range_min, self.joystick_range_max)
+        is_left = joystick_vals < self.joystick_midpoint
+        is_right = joystick_vals > self.joystick_midpoint
+        # same rule as get_wheel_angles, a value of exactly 0 doesn't turn either
+        is_turning = joystick_vals != 0.0
+        is_left &= is_turning
+        is_right &= is_turning
+        center_points = self.get_scaled_center_points(joystick_vals, is_right)
+        # the same wheel angle math as RoverWheelAngleCalculator.get_wheel_angles_batch, with every
+        # geometry constant an array over the fleet instead of a single number
+        rover_wheel_angle_calculator.fill_wheel_angles_batch(
+            center_points, is_left, is_right, out,
+            theta_max=self.theta_max,
+            phi_max=self.phi_max,
+            distance_between_front_pivots=self.distance_between_front_pivots,
+            distance_between_axels=self.distance_between_axels,
+            wheel_gap_distance=self.wheel_gap_distance,
+        )
+        return out
@@ -0,0 +1,169 @@
+"""
+Sweep rover geometries and collect the wheel angles table for every combination into one dataset.
+
+Geometries are split into batches and spread over a process pool; each worker computes the
+vectorized table (RoverWheelAngleCalculator.get_wheel_angles_table_batch) for its geometries and
+sends back plain numpy arrays, so the pool overhead is a handful of pickles per batch rather than
+per row.
+
+Command line usage, each geometry parameter takes a list of values and/or start:stop:step ranges
+(stop included):
+
+    python src/geometry_sweep.py --theta-max 40:46:2 --distance-between-axels 8:12:0.5 --output sweep.parquet
+"""
+import argparse
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+import wheel_angles_export
+
+
+# RoverWheelAngleCalculator arguments that can be swept, and their defaults
+GEOMETRY_PARAMS = {
+    'theta_max': 44,
+    'phi_max': 30,
+    'distance_between_front_wheels': 9,
+    'distance_between_front_pivots': 7,
+    'distance_between_axels': 10,
+}
+
+# batches handed out per worker; more than 1 so a slow batch doesn't leave the other cores idle
+BATCHES_PER_WORKER = 4
+
+
+def get_geometries(param_ranges):
+    """
+    Every combination of the swept parameters, unswept parameters stay at their defaults.
+    :param param_ranges: dict of GEOMETRY_PARAMS name -> list of values
+    :return: list of dicts of RoverWheelAngleCalculator geometry arguments
+    """
+    for name in param_ranges:
+        if name not in GEOMETRY_PARAMS:
+            raise Exception(f"Error: can't sweep '{name}', must be one of {list(GEOMETRY_PARAMS)}.")
+    names = list(GEOMETRY_PARAMS)
+    values = [list(param_ranges.get(name, [GEOMETRY_PARAMS[name]])) for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def compute_geometry_tables(geometries, joystick_range, joystick_input_step_size, include_endpoint):
+    """
+    Worker side of the sweep: the wheel angles table for each geometry, concatenated, with the
+    geometry parameters repeated on every row. Geometries with no practical center point range
+    (RoverGeometry raises ValueError, e.g. on a math domain error or theta_max=0) are skipped and
+    handed back separately.
+    :return: (dict of column name -> numpy array, list of skipped geometries)
+    """
+    joystick_vals = wheel_angles_export.get_joystick_grid(
+        joystick_range, joystick_input_step_size, 0,
+        wheel_angles_export.get_joystick_grid_size(joystick_range, joystick_input_step_size, include_endpoint),
+        include_endpoint)
+    columns = list(GEOMETRY_PARAMS) + wheel_angles_export.EXPORT_COLUMNS
+    tables = {name: [] for name in columns}
+    skipped = []
+    for geometry in geometries:
+        try:
+            calculator = RoverWheelAngleCalculator(joystick_range=joystick_range, **geometry)
+            table = calculator.get_wheel_angles_table_batch(joystick_vals)
+        except ValueError:
+            skipped.append(geometry)
+            continue
+        for name, value in geometry.items():
+            table[name] = np.full(len(joystick_vals), value)
+        for name in columns:
+            tables[name].append(table[name])
+    return tables, skipped
+
+
+def sweep_wheel_angles(param_ranges,
+                       joystick_range=None,  # [min val, max val]
+                       joystick_input_step_size=1,
+                       include_endpoint=True,
+                       max_workers=None  # processes; None for one per core, 0 to run in this process
+                       ):
+    """
+    Wheel angles tables for every combination of geometry parameters in one DataFrame, with one
+    column per geometry parameter followed by the wheel_angles_export.EXPORT_COLUMNS. Geometries that
+    couldn't be computed are listed in df.attrs['skipped_geometries'].
+    :param param_ranges: dict of GEOMETRY_PARAMS name -> list of values to sweep
+    :return:
+    """
+    if not joystick_range:
+        joystick_range = [-100, 100]
+    geometries = get_geometries(param_ranges)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers == 0:
+        results = [compute_geometry_tables(geometries, joystick_range, joystick_input_step_size, include_endpoint)]
+    else:
+        batch_size = max(1, math.ceil(len(geometries) / (max_workers * BATCHES_PER_WORKER)))
+        batches = [geometries[ix:ix + batch_size] for ix in range(0, len(geometries), batch_size)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(
+                compute_geometry_tables,
+                batches,
+                itertools.repeat(joystick_range),
+                itertools.repeat(joystick_input_step_size),
+                itertools.repeat(include_endpoint)))
+    columns = list(GEOMETRY_PARAMS) + wheel_angles_export.EXPORT_COLUMNS
+    df = pd.DataFrame({
+        name: np.concatenate([array for tables, skipped in results for array in tables[name]] or [np.empty(0)])
+        for name in columns
+    })
+    df['turn_direction'] = pd.Categorical.from_codes(
+        df['turn_direction'].astype(np.int8) + 1, wheel_angles_export.TURN_DIRECTIONS)
+    df.attrs['skipped_geometries'] = [geometry for tables, skipped in results for geometry in skipped]
+    return df
+
+
+def parse_param_values(text):
+    """
+    '40,42,50:60:5' -> [40, 42, 50, 55, 60]
+    """
+    values = []
+    for part in text.split(','):
+        if ':' in part:
+            start, stop, step = (float(val) for val in part.split(':'))
+            size = wheel_angles_export.get_joystick_grid_size([start, stop], step, include_endpoint=True)
+            values.extend(wheel_angles_export.get_joystick_grid([start, stop], step, 0, size, True).tolist())
+        else:
+            values.append(float(part))
+    return values
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Sweep rover geometries and export all wheel angles tables.")
+    for name, default in GEOMETRY_PARAMS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=parse_param_values, default=[default],
+                            help=f"values to sweep, e.g. 1,2,3 or start:stop:step (default {default})")
+    parser.add_argument('--joystick-range', type=float, nargs=2, default=[-100, 100])
+    parser.add_argument('--step', type=float, default=1, help="joystick input step size")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default one per core)")
+    parser.add_argument('--output', default='wheel_angles_sweep.parquet', help=".parquet, .feather or .csv")
+    args = parser.parse_args(args)
+    param_ranges = {name: getattr(args, name) for name in GEOMETRY_PARAMS}
+    num_geometries = len(get_geometries(param_ranges))
+    start_time = time.perf_counter()
+    df = sweep_wheel_angles(param_ranges, args.joystick_range, args.step, max_workers=args.workers)
+    elapsed = time.perf_counter() - start_time
+    output_format = wheel_angles_export.get_export_format(args.output)
+    if output_format == 'parquet':
+        df.to_parquet(args.output, index=False)
+    elif output_format == 'feather':
+        df.to_feather(args.output)
+    elif output_format == 'csv':
+        df.to_csv(args.output, index=False)
+    else:
+        raise Exception("Error: sweep output must be .parquet, .feather or .csv.")
+    num_skipped = len(df.attrs['skipped_geometries'])
+    print(f"Swept {num_geometries} geometries ({len(df)} rows, {num_skipped} geometries skipped because they "
+          f"have no practical center point range) in {elapsed:.2f}s, saved to '{args.output}'.")
+    return
+
+
+if __name__ == '__main__':
+    main()
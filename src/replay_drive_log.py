@@ -0,0 +1,192 @@
+"""
+Replay a recorded drive log of joystick values through the calculator and write the commanded wheel
+angles, e.g. after tuning the geometry.
+
+The log is streamed in chunks and each chunk goes through get_wheel_angles_batch, optionally on a pool
+of worker processes. Only a few chunks per worker are ever in flight and results are written in log
+order as they come back, so memory use stays the same however long the log is.
+
+Logs are either CSV (one column of joystick values, pick it with --column, the first one by default)
+or raw binary joystick values (.bin/.f32, little endian float32 unless --input-dtype says otherwise).
+Output is CSV, or with a .bin/.f32 extension raw little endian float32 rows of
+(input_value, left_front, right_front, left_back, right_back).
+
+    python src/replay_drive_log.py drive_log.csv --column joystick_x --distance-between-axels 10.5 --output wheel_angles.csv
+"""
+import argparse
+import collections
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+
+
+# log rows read, computed and written per chunk
+REPLAY_CHUNK_SIZE = 262144
+# chunks queued up per worker, enough to keep every worker busy without reading the whole log ahead
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+REPLAY_COLUMNS = ['input_value', 'left_front', 'right_front', 'left_back', 'right_back']
+BINARY_EXTENSIONS = ['.bin', '.f32']
+
+# RoverWheelAngleCalculator arguments that can be given on the command line
+CALCULATOR_ARGS = {
+    'theta_max': float,
+    'phi_max': float,
+    'distance_between_front_wheels': float,
+    'distance_between_front_pivots': float,
+    'distance_between_axels': float,
+    'input_scale': str,
+}
+
+# the calculator a worker process replays with, built once by _init_worker
+_worker_calculator = None
+
+
+def get_log_format(path):
+    if os.path.splitext(str(path))[1].lower() in BINARY_EXTENSIONS:
+        return 'binary'
+    return 'csv'
+
+
+def read_log_chunks(path, chunk_size=REPLAY_CHUNK_SIZE, column=None, input_dtype='<f4'):
+    """
+    Joystick values from a drive log, chunk_size at a time.
+    :param path: CSV or binary log, see get_log_format
+    :param column: CSV column name, None for the first column
+    :param input_dtype: numpy dtype of the values in a binary log
+    :return: generator of float64 numpy arrays
+    """
+    if get_log_format(path) == 'binary':
+        with open(path, 'rb') as f:
+            while True:
+                joystick_vals = np.fromfile(f, dtype=input_dtype, count=chunk_size)
+                if not len(joystick_vals):
+                    break
+                yield joystick_vals.astype(np.float64)
+    else:
+        import pandas
+        usecols = [column] if column is not None else [0]
+        for df in pandas.read_csv(path, usecols=usecols, chunksize=chunk_size):
+            yield df.iloc[:, 0].to_numpy(dtype=np.float64)
+    return
+
+
+def format_chunk(joystick_vals, wheel_angles, output_format, header=False):
+    """
+    Encode replayed rows the way they go into the output file.
+    :param output_format: 'csv' or 'binary'
+    :param header: write the CSV header line first
+    :return: bytes
+    """
+    if output_format == 'binary':
+        rows = np.empty((len(joystick_vals), 5), dtype='<f4')
+        rows[:, 0] = joystick_vals
+        rows[:, 1:] = wheel_angles
+        return rows.tobytes()
+    import pandas
+    df = pandas.DataFrame(wheel_angles, columns=REPLAY_COLUMNS[1:])
+    df.insert(0, 'input_value', joystick_vals)
+    # no line terminator argument, it was renamed in pandas 1.5 (line_terminator -> lineterminator); lines
+    # end in os.linesep like export_wheel_angles_table's CSV
+    return df.to_csv(header=header, index=False).encode()
+
+
+def _init_worker(calculator_kwargs):
+    global _worker_calculator
+    _worker_calculator = RoverWheelAngleCalculator(**calculator_kwargs)
+    return
+
+
+def replay_chunk(joystick_vals, output_format, header=False):
+    """
+    Worker side of the replay: one chunk of the log, computed and encoded. Formatting CSV text costs
+    far more than the angles themselves, so it's done here where it runs on every core.
+    :return: bytes for the output file
+    """
+    wheel_angles = _worker_calculator.get_wheel_angles_batch(joystick_vals)
+    return format_chunk(joystick_vals, wheel_angles, output_format, header)
+
+
+def replay_drive_log(log_path,
+                     output,
+                     calculator_kwargs=None,  # RoverWheelAngleCalculator arguments
+                     column=None,  # CSV column of joystick values, None for the first
+                     input_dtype='<f4',  # value type of binary logs
+                     chunk_size=REPLAY_CHUNK_SIZE,
+                     max_workers=None,  # processes; None for one per core, 0 to run in this process
+                     progress=None  # callable(rows_written)
+                     ):
+    """
+    Stream log_path through the calculator into output, see the module docstring.
+    :return: number of rows replayed
+    """
+    if not calculator_kwargs:
+        calculator_kwargs = {}
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    output_format = get_log_format(output)
+    chunks = read_log_chunks(log_path, chunk_size, column, input_dtype)
+    rows_written = 0
+    with open(output, 'wb') as f:
+        if max_workers == 0:
+            _init_worker(calculator_kwargs)
+            for joystick_vals in chunks:
+                f.write(replay_chunk(joystick_vals, output_format, header=rows_written == 0))
+                rows_written += len(joystick_vals)
+                if progress:
+                    progress(rows_written)
+            return rows_written
+        max_in_flight = max_workers * CHUNKS_IN_FLIGHT_PER_WORKER
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(calculator_kwargs,)) as executor:
+            # (rows, future) in log order; the oldest is always written first, so the output stays in order
+            in_flight = collections.deque()
+            for chunk_ix, joystick_vals in enumerate(chunks):
+                in_flight.append((len(joystick_vals),
+                                  executor.submit(replay_chunk, joystick_vals, output_format, chunk_ix == 0)))
+                while len(in_flight) >= max_in_flight or (in_flight and in_flight[0][1].done()):
+                    num_rows, future = in_flight.popleft()
+                    f.write(future.result())
+                    rows_written += num_rows
+                    if progress:
+                        progress(rows_written)
+            while in_flight:
+                num_rows, future = in_flight.popleft()
+                f.write(future.result())
+                rows_written += num_rows
+                if progress:
+                    progress(rows_written)
+    return rows_written
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Replay a drive log of joystick values into wheel angles.")
+    parser.add_argument('log', help="drive log, .csv or binary (.bin, .f32)")
+    parser.add_argument('--output', default='wheel_angles_replay.csv', help=".csv or binary (.bin, .f32)")
+    parser.add_argument('--column', default=None, help="CSV column of joystick values (default the first)")
+    parser.add_argument('--input-dtype', default='<f4', help="value type of binary logs (default <f4)")
+    for name, arg_type in CALCULATOR_ARGS.items():
+        parser.add_argument('--' + name.replace('_', '-'), type=arg_type, default=None)
+    parser.add_argument('--joystick-range', type=float, nargs=2, default=None)
+    parser.add_argument('--chunk-size', type=int, default=REPLAY_CHUNK_SIZE, help="log rows per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default one per core, 0 for none)")
+    parser.add_argument('--progress', action='store_true', help="print progress per chunk")
+    args = parser.parse_args(args)
+    calculator_kwargs = {name: getattr(args, name) for name in CALCULATOR_ARGS if getattr(args, name) is not None}
+    if args.joystick_range:
+        calculator_kwargs['joystick_range'] = args.joystick_range
+
+    def print_progress(rows_written):
+        print(f"Drive log replay: {rows_written} rows written.")
+    start_time = time.perf_counter()
+    num_rows = replay_drive_log(args.log, args.output, calculator_kwargs, args.column, args.input_dtype,
+                                args.chunk_size, args.workers, print_progress if args.progress else None)
+    elapsed = time.perf_counter() - start_time
+    print(f"Replayed {num_rows} rows in {elapsed:.2f}s ({num_rows / max(elapsed, 1e-9):.0f} rows/s), "
+          f"saved to '{args.output}'.")
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import math
+
+
+class RoverGeometry:
+    """
+    Rover dimensions and steering limits, plus every constant RoverWheelAngleCalculator derives from
+    them, computed once up front. Immutable: to change the geometry, make a new one with replace().
+    That way nothing derived from the old dimensions can ever go stale.
+
+    See RoverWheelAngleCalculator for what the parameters mean. Raises ValueError if there is no
+    practical center point range for the geometry.
+    """
+    # constructor parameters, in order
+    PARAMS = (
+        'theta_max',
+        'phi_max',
+        'distance_between_front_wheels',
+        'distance_between_front_pivots',
+        'distance_between_axels',
+        'joystick_range',
+        'input_scale',
+    )
+    __slots__ = PARAMS + (
+        'wheel_gap_distance',
+        'distance_between_axels_squared',
+        'joystick_midpoint',
+        'joystick_range_size',
+        'practical_center_point_range_linear',
+        'practical_center_point_range_logscale',
+        'center_point_range',
+        'center_point_range_size',
+        'center_point_log_slope',
+        'center_point_log_offset',
+        'radians_to_degrees',
+    )
+
+    def __init__(self,
+                 theta_max=44,
+                 phi_max=30,
+                 distance_between_front_wheels=9,
+                 distance_between_front_pivots=7,
+                 distance_between_axels=10,
+                 joystick_range=(-100, 100),
+                 input_scale='linear'
+                 ):
+        if input_scale not in ['log', 'linear']:
+            raise Exception("Error: input_scale must be 'log' or 'linear'.")
+        init = object.__setattr__
+        init(self, 'theta_max', theta_max)
+        init(self, 'phi_max', phi_max)
+        init(self, 'distance_between_front_wheels', distance_between_front_wheels)
+        init(self, 'distance_between_front_pivots', distance_between_front_pivots)
+        init(self, 'distance_between_axels', distance_between_axels)
+        init(self, 'joystick_range', tuple(joystick_range))
+        init(self, 'input_scale', input_scale)
+        # derived constants
+        init(self, 'wheel_gap_distance', (distance_between_front_wheels - distance_between_front_pivots) / 2)  # '(a-c)/2'
+        init(self, 'distance_between_axels_squared', distance_between_axels ** 2)
+        init(self, 'joystick_midpoint', (self.joystick_range[0] + self.joystick_range[1]) / 2)
+        init(self, 'joystick_range_size', self.joystick_range[1] - self.joystick_range[0])
+        init(self, 'radians_to_degrees', 180.0 / math.pi)
+        try:
+            init(self, 'practical_center_point_range_linear', self.calc_practical_center_point_range_linear())
+            practical_center_point_range_logscale = None
+            if input_scale == 'log':
+                practical_center_point_range_logscale = self.calc_practical_center_point_range_logscale()
+        except (ValueError, ZeroDivisionError) as e:
+            # math domain errors, and theta_max or phi_max of 0 (sin(0) in get_max_turn_radii)
+            raise ValueError(f"Error: no practical center point range for this geometry ({e}).") from e
+        init(self, 'practical_center_point_range_logscale', practical_center_point_range_logscale)
+        if input_scale == 'log':
+            init(self, 'center_point_range', self.practical_center_point_range_logscale)
+        else:
+            init(self, 'center_point_range', self.practical_center_point_range_linear)
+        init(self, 'center_point_range_size', self.center_point_range[1] - self.center_point_range[0])
+        # log scale maps joystick values to center points with exp(); this is the line it goes through,
+        # center_point = exp(offset + (slope * joystick_val))
+        center_point_log_slope = None
+        center_point_log_offset = None
+        if input_scale == 'log':
+            center_point_log_slope = self.center_point_range_size / self.joystick_range_size
+            center_point_log_offset = self.center_point_range[0] - (self.joystick_range[0] * center_point_log_slope)
+        init(self, 'center_point_log_slope', center_point_log_slope)
+        init(self, 'center_point_log_offset', center_point_log_offset)
+        return
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RoverGeometry is immutable, use replace() to make a changed copy.")
+
+    def __delattr__(self, name):
+        raise AttributeError("RoverGeometry is immutable, use replace() to make a changed copy.")
+
+    def __reduce__(self):
+        # pickle and copy would restore the slots one setattr at a time, which __setattr__ refuses; go
+        # through __init__ instead, which recomputes the derived constants too
+        return (RoverGeometry, tuple(getattr(self, name) for name in self.PARAMS))
+
+    def get_params(self):
+        """
+        :return: dict of the constructor parameters
+        """
+        return {name: getattr(self, name) for name in self.PARAMS}
+
+    def replace(self, **changes):
+        """
+        New geometry with some constructor parameters changed, derived constants are all recomputed.
+        """
+        params = self.get_params()
+        params.update(changes)
+        return RoverGeometry(**params)
+
+    def __eq__(self, other):
+        if not isinstance(other, RoverGeometry):
+            return NotImplemented
+        return self.get_params() == other.get_params()
+
+    def __hash__(self):
+        return hash(tuple(self.get_params().values()))
+
+    def __repr__(self):
+        params = ', '.join(f"{name}={value!r}" for name, value in self.get_params().items())
+        return f"RoverGeometry({params})"
+
+    def get_max_turn_radii(self):
+        radius_inner = (self.distance_between_axels / math.sin(self.theta_max)) - self.wheel_gap_distance
+        radius_outer = (self.distance_between_axels / math.sin(self.phi_max)) + self.wheel_gap_distance
+        return radius_inner, radius_outer
+
+    def calc_practical_center_point_range_linear(self):
+        max_turn_radii = self.get_max_turn_radii()
+        min_practical_center_point = (self.distance_between_axels * math.sin(90 - self.theta_max)) + self.distance_between_front_pivots
+        max_practical_center_point = math.sqrt(
+            (max_turn_radii[0] ** 2) - (self.distance_between_axels ** 2)) + self.distance_between_front_pivots
+        return min_practical_center_point, max_practical_center_point
+
+    def calc_practical_center_point_range_logscale(self):
+        center_point_range = self.practical_center_point_range_linear
+        return math.log(center_point_range[0]), math.log(center_point_range[1])
@@ -0,0 +1,181 @@
+"""
+Pygame rendering of rover wheels for visualizing wheel angles, fast enough to monitor a lot of rovers
+at once (see tests/pygame_example_ui.py).
+
+- Wheel sprites are rotated once per quantized angle and cached, instead of making, converting and
+  rotating a new surface for every wheel every frame.
+- Only what changed is redrawn: render() returns dirty rects for pygame.display.update().
+- If a rover's joystick value hasn't changed, neither get_wheel_angles nor any drawing happens.
+
+Needs pygame ('pip install pygame').
+"""
+import pygame
+
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+
+# degrees; wheel sprites are cached per multiple of this
+DEFAULT_ANGLE_STEP = 0.5
+
+
+def get_wheel_positions(center, rover_x, rover_y, wheel_width=20, wheel_height=35, pixels_per_unit=1):
+    """
+    Wheel rects around a rover center on screen, in get_wheel_angles order.
+    :param center: (x, y) pixel position of the middle of the rover
+    :param rover_x: full width of the rover, i.e. distance_between_front_wheels
+    :param rover_y: distance from the middle of the rover to the front wheels, i.e. distance_between_axels
+    :param pixels_per_unit: screen pixels per rover distance unit
+    :return: list of pygame rects (left, top, width, height) for left_front, right_front, left_back, right_back
+    """
+    wheel_pixel_x_term = pixels_per_unit * (rover_x / 2)
+    wheel_pixel_y_term = pixels_per_unit * rover_y
+    # going DOWN the screen is positive, don't get confused with screen y axis!
+    return [
+        pygame.Rect(center[0] - wheel_pixel_x_term, center[1] - wheel_pixel_y_term, wheel_width, wheel_height),
+        pygame.Rect(center[0] + wheel_pixel_x_term, center[1] - wheel_pixel_y_term, wheel_width, wheel_height),
+        pygame.Rect(center[0] - wheel_pixel_x_term, center[1] + wheel_pixel_y_term, wheel_width, wheel_height),
+        pygame.Rect(center[0] + wheel_pixel_x_term, center[1] + wheel_pixel_y_term, wheel_width, wheel_height),
+    ]
+
+
+class WheelSpriteCache:
+    """
+    Rotated wheel sprites, made on first use for each angle (rounded to angle_step) and reused after.
+    With the default step a wheel that turns up to 45 degrees either way needs at most 181 sprites.
+    """
+
+    def __init__(self, width, height, color=BLACK, border_radius=2, angle_step=DEFAULT_ANGLE_STEP):
+        self.width = width
+        self.height = height
+        self.color = color
+        self.border_radius = border_radius
+        self.angle_step = angle_step
+        self.sprites = {}
+        return
+
+    def get(self, angle):
+        """
+        :param angle: degrees, counter-clockwise like pygame.transform.rotate
+        :return: rotated pygame.Surface
+        """
+        key = round(angle / self.angle_step)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            # the wheel goes in the corner of a square surface that is rotated about its middle,
+            # https://stackoverflow.com/questions/36510795/rotating-a-rectangle-not-image-in-pygame
+            max_area = max(self.width, self.height)
+            sprite = pygame.Surface((max_area, max_area), pygame.SRCALPHA)
+            pygame.draw.rect(sprite, self.color, (0, 0, self.width, self.height), border_radius=self.border_radius)
+            sprite = pygame.transform.rotate(sprite, key * self.angle_step)
+            # in the display's pixel format, so blitting it every frame doesn't convert it every time
+            # (convert_alpha needs a display, which there always is once anything is being drawn)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            self.sprites[key] = sprite
+        return sprite
+
+
+class RoverRenderer:
+    """
+    Draws one rover's wheels onto surface from its joystick value. Several renderers (one per rover)
+    can share a surface, background and sprite cache.
+    """
+
+    def __init__(self, surface, background, wheel_angle_calculator, wheel_positions, sprite_cache=None):
+        """
+        :param surface: pygame.Surface to draw on, usually the display
+        :param background: pygame.Surface the size of surface, used to erase wheels before redrawing them
+        :param wheel_angle_calculator: RoverWheelAngleCalculator for this rover
+        :param wheel_positions: 4 wheel rects, see get_wheel_positions
+        :param sprite_cache: WheelSpriteCache, None to make one from the first wheel's size
+        """
+        self.surface = surface
+        self.background = background
+        self.wheel_angle_calculator = wheel_angle_calculator
+        self.wheel_positions = [pygame.Rect(position) for position in wheel_positions]
+        if sprite_cache is None:
+            sprite_cache = WheelSpriteCache(self.wheel_positions[0].width, self.wheel_positions[0].height)
+        self.sprite_cache = sprite_cache
+        self.joystick_val = None
+        # where each wheel was last drawn, to erase it next time
+        self.drawn_rects = []
+        return
+
+    def render(self, joystick_val):
+        """
+        Redraw the wheels if joystick_val changed since the last call.
+        :param joystick_val:
+        :return: list of dirty rects to pass to pygame.display.update, empty if nothing changed
+        """
+        if joystick_val == self.joystick_val:
+            return []
+        self.joystick_val = joystick_val
+        return self.redraw()
+
+    def redraw(self):
+        """
+        Erase and draw the wheels again, e.g. after something else drew over them.
+        :return: list of dirty rects
+        """
+        dirty_rects = []
+        for drawn_rect in self.drawn_rects:
+            self.surface.blit(self.background, drawn_rect, drawn_rect)
+            dirty_rects.append(drawn_rect)
+        self.drawn_rects = []
+        if self.joystick_val is None:
+            return dirty_rects
+        wheel_angles = self.wheel_angle_calculator.get_wheel_angles(self.joystick_val)
+        for wheel_position, wheel_angle in zip(self.wheel_positions, wheel_angles):
+            # flip the rotation of the wheel angle because pygame rotates counter-clockwise
+            # and the RoverWheelAngleCalculator expects clockwise (RoverWheelAngleCalculator
+            # sends negative angle meaning for wheel to rotate left from vertical, pygame
+            # does opposite)
+            sprite = self.sprite_cache.get(-wheel_angle)
+            drawn_rect = self.surface.blit(sprite, wheel_position.topleft)
+            self.drawn_rects.append(drawn_rect)
+            dirty_rects.append(drawn_rect)
+        return dirty_rects
+
+
+class FrameTimeOverlay:
+    """
+    FPS and frame time (the time spent rendering, not waiting for the next frame) in a corner of the
+    screen, refreshed a couple of times a second so it doesn't dirty the screen every frame.
+    """
+
+    def __init__(self, surface, background, position=(5, 5), color=BLACK, refresh_interval_ms=500):
+        self.surface = surface
+        self.background = background
+        self.position = position
+        self.color = color
+        self.refresh_interval_ms = refresh_interval_ms
+        self.font = pygame.font.Font(None, 22)
+        self.drawn_rect = None
+        self.last_refresh_ms = None
+        self.frame_times_ms = []
+        return
+
+    def render(self, clock, frame_time_ms):
+        """
+        :param clock: the pygame.time.Clock ticking the main loop, for the FPS
+        :param frame_time_ms: time this frame's work took
+        :return: list of dirty rects
+        """
+        self.frame_times_ms.append(frame_time_ms)
+        now_ms = pygame.time.get_ticks()
+        if self.last_refresh_ms is not None and now_ms - self.last_refresh_ms < self.refresh_interval_ms:
+            return []
+        self.last_refresh_ms = now_ms
+        mean_frame_time_ms = sum(self.frame_times_ms) / len(self.frame_times_ms)
+        max_frame_time_ms = max(self.frame_times_ms)
+        self.frame_times_ms = []
+        text = self.font.render(f"{clock.get_fps():.1f} FPS, frame {mean_frame_time_ms:.2f}ms "
+                                f"(max {max_frame_time_ms:.2f}ms)", True, self.color)
+        dirty_rects = []
+        if self.drawn_rect is not None:
+            self.surface.blit(self.background, self.drawn_rect, self.drawn_rect)
+            dirty_rects.append(self.drawn_rect)
+        self.drawn_rect = self.surface.blit(text, self.position)
+        dirty_rects.append(self.drawn_rect)
+        return dirty_rects
@@ -1,7 +1,15 @@
 import math
-import pandas as pd
-import statistics
+import os
+import rover_geometry
 import utils
+import wheel_angles_cache
+import wheel_angles_instrumentation
+import wheel_angles_table_file
+
+# joystick values per vectorized pass in get_wheel_angles_batch
+BATCH_CHUNK_SIZE = 8192
+# table entries over the joystick range for engine='lut'
+DEFAULT_LUT_RESOLUTION = 1001
 
 
 class RoverWheelAngleCalculator:
@@ -13,6 +21,13 @@ class RoverWheelAngleCalculator:
     identities and nifty equations I threw in...
 
     Rover front and back wheels are mirrored, so 'rear' equations are ignored.
+
+    Thread safety: computing angles (get_wheel_angles, get_wheel_angles_batch, export and everything they
+    call) only reads the calculator, it never writes to it (apart from the optional cache, which has its own
+    lock, and instrumentation, which keeps per thread stats), so one calculator can be shared by any number
+    of threads. Changing the geometry (set_geometry, or assigning e.g. theta_max) or turning instrumentation
+    on/off is not synchronized with calls running in other threads, so do that while nothing else is using
+    the calculator.
     """
 
     def __init__(self,
@@ -22,38 +37,96 @@ class RoverWheelAngleCalculator:
                  distance_between_front_pivots=7,  # 'c' in diagram
                  distance_between_axels=10,  # 'b' in diagram
                  joystick_range=None,  # [max val left, max val right]
-                 input_scale='linear'  # 'log' or 'linear'
+                 input_scale='linear',  # 'log' or 'linear'
+                 engine='exact',  # 'exact' or 'lut'
+                 lut_resolution=DEFAULT_LUT_RESOLUTION,  # number of table entries over joystick_range for 'lut'
+                 lut_dir=None,  # directory of memory-mapped table files for 'lut', shared between processes
+                 cache_size=None,  # cache this many get_wheel_angles results, None for no cache
+                 cache_quantum=None,  # round joystick values to a multiple of this before caching, None for exact
+                 cache_eviction='lru'  # 'lru' or 'fifo'
                  ):
         # handle inputs
-        self.theta_max = theta_max
-        self.phi_max = phi_max
-        self.distance_between_front_wheels = distance_between_front_wheels
-        self.distance_between_front_pivots = distance_between_front_pivots
-        self.distance_between_axels = distance_between_axels
-        self.joystick_range = joystick_range
-        if not self.joystick_range:
-            self.joystick_range = [-100, 100]
-        self.input_scale = input_scale
-        if self.input_scale not in ['log', 'linear']:
-            raise Exception("Error: input_scale must be 'log' or 'linear'.")
-        # TODO: enable log scale
-        if self.input_scale == 'log':
-            raise Exception("Error: log scale not enabled yet. Try linear instead.")
-        # define internal vars
-        self.joystick_direction = 'center'
-        self.wheel_gap_distance = ((self.distance_between_front_wheels - self.distance_between_front_pivots)/2)  # '(a-c)/2'
-        self.joystick_midpoint = statistics.mean(self.joystick_range)
+        if not joystick_range:
+            joystick_range = [-100, 100]
+        # the lookup table engine trades a little accuracy for skipping all the trig on every call
+        self.engine = engine
+        if self.engine not in ['exact', 'lut']:
+            raise Exception("Error: engine must be 'exact' or 'lut'.")
+        self.lut_resolution = lut_resolution
+        self.lut_dir = lut_dir
+        if self.lut_dir is not None and self.engine != 'lut':
+            raise Exception("Error: lut_dir only works with engine='lut'.")
+        # repeat joystick values (the operator holding steady) can skip the computation entirely
+        self.wheel_angles_cache = None
+        if cache_size is not None:
+            self.wheel_angles_cache = wheel_angles_cache.WheelAnglesCache(
+                self.get_wheel_angles_uncached, cache_size, cache_quantum, cache_eviction)
+        # per stage timing, off unless enable_instrumentation is called
+        self.instrumentation = None
         # complete object initialization
-        # these params are lazy and will only be filled if needed
-        self.practical_center_point_range_linear = None
-        self.practical_center_point_range_logscale = None
+        # all the derived constants live on the (immutable) geometry, see set_geometry
+        self.geometry = None
+        self.lut = None
+        self.lut_max_error = None
+        self.set_geometry(rover_geometry.RoverGeometry(
+            theta_max=theta_max,
+            phi_max=phi_max,
+            distance_between_front_wheels=distance_between_front_wheels,
+            distance_between_front_pivots=distance_between_front_pivots,
+            distance_between_axels=distance_between_axels,
+            joystick_range=joystick_range,
+            input_scale=input_scale
+        ))
+        return
+
+    def set_geometry(self, geometry):
+        """
+        Swap in a new RoverGeometry (rebuild the lookup table and empty the cache if there are any).
+        Assigning any of the geometry attributes, e.g. calculator.theta_max = 40, goes through here too.
+        :param geometry: RoverGeometry
+        :return:
+        """
+        # results from the old geometry are all stale
+        if self.wheel_angles_cache is not None and self.geometry is not None:
+            self.wheel_angles_cache.clear()
+        self.geometry = geometry
+        if self.engine == 'lut' and self.lut_dir is not None:
+            self.lut, self.lut_max_error = self.load_wheel_angles_lut_file(self.lut_dir)
+        elif self.engine == 'lut':
+            self.lut = self.build_wheel_angles_lut(self.lut_resolution)
+            self.lut_max_error = self.get_lut_max_error()
         return
 
+    def _geometry_property(name):
+        def get_param(self):
+            return getattr(self.geometry, name)
+
+        def set_param(self, value):
+            self.set_geometry(self.geometry.replace(**{name: value}))
+        return property(get_param, set_param)
+
+    theta_max = _geometry_property('theta_max')
+    phi_max = _geometry_property('phi_max')
+    distance_between_front_wheels = _geometry_property('distance_between_front_wheels')
+    distance_between_front_pivots = _geometry_property('distance_between_front_pivots')
+    distance_between_axels = _geometry_property('distance_between_axels')
+    joystick_range = _geometry_property('joystick_range')
+    input_scale = _geometry_property('input_scale')
+    del _geometry_property
+
+    @property
+    def wheel_gap_distance(self):
+        return self.geometry.wheel_gap_distance
+
+    @property
+    def joystick_midpoint(self):
+        return self.geometry.joystick_midpoint
+
     def get_wheel_turn_radius_inner_front(self, theta):
-        return (self.distance_between_axels / math.sin(theta)) - self.wheel_gap_distance
+        return (self.geometry.distance_between_axels / math.sin(theta)) - self.geometry.wheel_gap_distance
 
     def get_wheel_turn_radius_outer_front(self, phi):
-        return (self.distance_between_axels / math.sin(phi)) + self.wheel_gap_distance
+        return (self.geometry.distance_between_axels / math.sin(phi)) + self.geometry.wheel_gap_distance
 
     # def get_wheel_turn_radius_inner_rear(self, theta):
     #     return (self.distance_between_axels / math.tan(theta)) - self.wheel_gap_distance
@@ -62,13 +135,15 @@ class RoverWheelAngleCalculator:
     #     return (self.distance_between_axels / math.tan(phi)) + self.wheel_gap_distance
 
     def get_wheel_theta_inner_front(self, if_turn_radius):
-        val = self.distance_between_axels / (if_turn_radius + self.wheel_gap_distance)
+        geometry = self.geometry
+        val = geometry.distance_between_axels / (if_turn_radius + geometry.wheel_gap_distance)
         val = utils.clamp(val, -1.0, 1.0)
         return math.asin(val)
 
     def get_wheel_phi_outer_front(self, of_turn_radius):
         # print(of_turn_radius, self.distance_between_axels, self.wheel_gap_distance)
-        val = self.distance_between_axels / (of_turn_radius - self.wheel_gap_distance)
+        geometry = self.geometry
+        val = geometry.distance_between_axels / (of_turn_radius - geometry.wheel_gap_distance)
         val = utils.clamp(val, -1.0, 1.0)
         return math.asin(val)
 
@@ -84,31 +159,21 @@ class RoverWheelAngleCalculator:
         # radius_inner_rear = self.get_wheel_turn_radius_inner_rear(self.theta_max)
         # radius_outer_rear = self.get_wheel_turn_radius_outer_rear(self.phi_max)
         # return radius_inner_front, radius_outer_front, radius_inner_rear, radius_outer_rear
-        radius_inner = self.get_wheel_turn_radius_inner_front(self.theta_max)
-        radius_outer = self.get_wheel_turn_radius_outer_front(self.phi_max)
-        return radius_inner, radius_outer
+        return self.geometry.get_max_turn_radii()
 
     def calc_practical_center_point_range_linear(self):
         """
 
         :return:
         """
-        max_turn_radii = self.get_max_turn_radii()
-        min_practical_center_point = (self.distance_between_axels * math.sin(90 - self.theta_max)) + self.distance_between_front_pivots
-        max_practical_center_point = math.sqrt(
-            (max_turn_radii[0] ** 2) - (self.distance_between_axels ** 2)) + self.distance_between_front_pivots
-        center_point_range = [min_practical_center_point, max_practical_center_point]
-        return center_point_range
+        return list(self.geometry.calc_practical_center_point_range_linear())
 
     def get_practical_center_point_range_linear(self):
         """
-        If already calculated, grab value stored to object. If not, then calculate.
+        Precomputed on the geometry.
         :return:
         """
-        if self.practical_center_point_range_linear:
-            return self.practical_center_point_range_linear
-        self.practical_center_point_range_linear = self.calc_practical_center_point_range_linear()
-        return self.practical_center_point_range_linear
+        return self.geometry.practical_center_point_range_linear
 
     def calc_practical_center_point_range_logscale(self):
         """
@@ -119,107 +184,218 @@ class RoverWheelAngleCalculator:
         exponential changes to wheel angle with center point inputs.
         :return:
         """
-        center_point_range = self.get_practical_center_point_range_linear()
-        center_point_range_logscale = [
-            math.log(center_point_range[0]),
-            math.log(center_point_range[1])
-        ]
-        return center_point_range_logscale
+        return list(self.geometry.calc_practical_center_point_range_logscale())
 
     def get_practical_center_point_range_logscale(self):
         """
-        If already calculated, grab value stored to object. If not, then calculate.
+        Precomputed on the geometry.
         :return:
         """
-        if self.practical_center_point_range_logscale:
-            return self.practical_center_point_range_logscale
-        self.practical_center_point_range_logscale = self.calc_practical_center_point_range_logscale()
-        return self.practical_center_point_range_logscale
+        if self.geometry.practical_center_point_range_logscale is None:
+            return tuple(self.calc_practical_center_point_range_logscale())
+        return self.geometry.practical_center_point_range_logscale
 
     def get_practical_center_point_range(self):
-        if self.input_scale == 'log':
-            return self.get_practical_center_point_range_logscale()
-        elif self.input_scale == 'linear':
-            return self.get_practical_center_point_range_linear()
-        else:
-            raise Exception("Error: input_scale must be either 'log' or 'linear'.")
-        return
+        return self.geometry.center_point_range
 
     def get_wheel_angles_from_center_point(self, center_point):
+        geometry = self.geometry
         # get the x distance
-        if_x = center_point - self.distance_between_front_pivots
+        if_x = center_point - geometry.distance_between_front_pivots
         of_x = center_point
         # pythagorean theorem!! eureka!!!!!!!!!! we have the bottom edge of the inner front wheel's
         # triangle and the height, now we just need to solve for the hypotenuse (the turn radius)!
         # Then with the turn radius we can calculate the wheel angle!!!!!!!!
-        if_turn_radius = math.sqrt((if_x ** 2) + (self.distance_between_axels ** 2))
-        if_angle = math.degrees(self.get_wheel_theta_inner_front(if_turn_radius))
+        if_turn_radius = math.sqrt((if_x ** 2) + geometry.distance_between_axels_squared)
+        if_angle = self.get_wheel_theta_inner_front(if_turn_radius) * geometry.radians_to_degrees
         # print(if_turn_radius, if_angle)
         # print(center_point, if_angle)
-        of_turn_radius = math.sqrt((of_x ** 2) + (self.distance_between_axels ** 2))
-        of_angle = math.degrees(self.get_wheel_phi_outer_front(of_turn_radius))
+        of_turn_radius = math.sqrt((of_x ** 2) + geometry.distance_between_axels_squared)
+        of_angle = self.get_wheel_phi_outer_front(of_turn_radius) * geometry.radians_to_degrees
         # print(of_turn_radius, of_angle)
         return if_angle, of_angle
 
-    def export_wheel_angles_table(self, joystick_input_step_size=None):
+    def get_wheel_angles_from_center_point_batch(self, center_points):
+        """
+        Vectorized version of get_wheel_angles_from_center_point.
+        :param center_points: numpy array of center points
+        :return: (inner angles, outer angles) numpy arrays in degrees
+        """
+        np = utils.import_numpy()
+        geometry = self.geometry
+        if center_points.dtype == np.float32:
+            return self._get_wheel_angles_from_center_point_batch_float32(center_points)
+        if_x = center_points - geometry.distance_between_front_pivots
+        of_x = center_points
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if_turn_radius = np.sqrt((if_x ** 2) + geometry.distance_between_axels_squared)
+            if_val = np.clip(geometry.distance_between_axels / (if_turn_radius + geometry.wheel_gap_distance), -1.0, 1.0)
+            of_turn_radius = np.sqrt((of_x ** 2) + geometry.distance_between_axels_squared)
+            of_val = np.clip(geometry.distance_between_axels / (of_turn_radius - geometry.wheel_gap_distance), -1.0, 1.0)
+        return np.degrees(np.arcsin(if_val)), np.degrees(np.arcsin(of_val))
+
+    def _get_wheel_angles_from_center_point_batch_float32(self, center_points):
+        """
+        get_wheel_angles_from_center_point_batch for float32. arcsin(b / radius) is very sensitive to
+        rounding as the angle gets close to 90 degrees (tight, unclamped turns), and float32 lost a couple
+        hundredths of a degree there. Same angle as atan2(b, sqrt(radius^2 - b^2)), and with
+        radius^2 = x^2 + b^2 + 2 * x_radius * offset + offset^2 there's nothing left that goes bad near 90.
+        """
+        np = utils.import_numpy()
+        geometry = self.geometry
+        distance_between_axels = np.float32(geometry.distance_between_axels)
+        distance_between_front_pivots = np.float32(geometry.distance_between_front_pivots)
+        wheel_gap_distance = np.float32(geometry.wheel_gap_distance)
+        angles = []
+        # inner: x = center_point - c, radius + (a-c)/2. outer: x = center_point, radius - (a-c)/2
+        for x, radius_offset in ((center_points - distance_between_front_pivots, wheel_gap_distance),
+                                 (center_points, -wheel_gap_distance)):
+            x_squared = x * x
+            x_turn_radius = np.sqrt(x_squared + (distance_between_axels * distance_between_axels))
+            val = x_squared + (2 * radius_offset) * x_turn_radius + (radius_offset * radius_offset)
+            # negative where b / radius is past +-1, which the exact path clips to +-90 degrees
+            np.maximum(val, 0.0, out=val)
+            np.sqrt(val, out=val)
+            angle = np.degrees(np.arctan2(distance_between_axels, val))
+            # a negative radius (wheel gap wider than the turn) turns the angle around, like b / radius does
+            angles.append(np.copysign(angle, x_turn_radius + radius_offset))
+        return angles[0], angles[1]
+
+    def get_scaled_center_point_input_from_joystick_input_batch(self, joystick_vals, is_right):
+        """
+        Vectorized version of get_scaled_center_point_input_from_joystick_input.
+        :param joystick_vals: numpy array of joystick values
+        :param is_right: boolean numpy array, True where the joystick direction is 'right'
+        :return: numpy array of center points
+        """
+        np = utils.import_numpy()
+        geometry = self.geometry
+        if geometry.input_scale == 'log':
+            mirrored_vals = np.where(is_right, (2 * geometry.joystick_midpoint) - joystick_vals, joystick_vals)
+            return np.exp(geometry.center_point_log_offset + (geometry.center_point_log_slope * mirrored_vals))
+        if joystick_vals.dtype == np.float32:
+            # same line, but right inputs are measured from the end of the joystick range instead of having
+            # the whole range size subtracted afterwards, which cancels away most of float32's digits there
+            range_start = np.where(is_right, np.float32(geometry.joystick_range[1]), np.float32(geometry.joystick_range[0]))
+            return (((joystick_vals - range_start) * np.float32(geometry.center_point_range_size))
+                    / np.float32(geometry.joystick_range_size)) + np.float32(geometry.center_point_range[0])
+        center_points = (((joystick_vals - geometry.joystick_range[0]) * geometry.center_point_range_size)
+                         / geometry.joystick_range_size) + geometry.center_point_range[0]
+        # in the center points' precision (an integer grid of joystick values still gives float64 center
+        # points), so float32 stays float32 without the range size being cut to an integer
+        center_points -= is_right * center_points.dtype.type(geometry.center_point_range_size)
+        return center_points
+
+    def get_wheel_angles_table_batch(self, joystick_vals):
+        """
+        One chunk of the export table: turn direction and the (unsigned, unclamped) inner and outer wheel
+        angles for each joystick value.
+        :param joystick_vals: numpy array of joystick values
+        :return: dict of numpy arrays keyed by wheel_angles_export.EXPORT_COLUMNS
+        """
+        np = utils.import_numpy()
+        geometry = self.geometry
+        # -1 left, 0 center, 1 right
+        turn_direction = np.sign(joystick_vals - geometry.joystick_midpoint).astype(np.int8)
+        center_points = self.get_scaled_center_point_input_from_joystick_input_batch(joystick_vals, turn_direction == 1)
+        inner_angle, outer_angle = self.get_wheel_angles_from_center_point_batch(center_points)
+        is_straight = (joystick_vals == 0.0) | (turn_direction == 0)
+        inner_angle[is_straight] = 0.0
+        outer_angle[is_straight] = 0.0
+        return {
+            'input_value': joystick_vals,
+            'turn_direction': turn_direction,
+            'inner_wheel_angle': inner_angle,
+            'outer_wheel_angle': outer_angle,
+        }
+
+    def export_wheel_angles_table(self,
+                                  joystick_input_step_size=None,
+                                  output='wheel_angles.csv',  # path or open file object
+                                  output_format=None,  # 'csv', 'parquet', 'feather' or 'binary'; None to go by extension
+                                  chunk_size=None,  # rows per chunk, None for wheel_angles_export.EXPORT_CHUNK_SIZE
+                                  progress=None,  # True to print progress per chunk, or a callable(rows_written, total_rows)
+                                  include_endpoint=False,  # also export joystick_range[1]
+                                  dtype=None  # e.g. np.float32 to compute in single precision, None for float64
+                                  ):
+        """
+        Stream the wheel angles table to output in chunks of chunk_size rows, so memory use stays the
+        same no matter how many rows there are. See wheel_angles_export for the formats.
+
+        joystick_input_step_size can be fractional (e.g. 0.01). Each chunk of joystick values is generated
+        as one array and goes straight into the vectorized angle math.
+
+        With dtype=np.float32 the angles are usually within a few thousandths of a degree of float64. The
+        table angles aren't clamped though, and right where one reaches 90 degrees it moves so fast with the
+        joystick value that just rounding the joystick value to float32 can move it a few hundredths of a
+        degree (how much depends on the geometry, see tests/float32_accuracy_test.py).
+        """
+        # export pulls in numpy and pandas, which the steering core doesn't need
+        import wheel_angles_export
+        geometry = self.geometry
+        if chunk_size is None:
+            chunk_size = wheel_angles_export.EXPORT_CHUNK_SIZE
         # fill default if none supplied
         if not joystick_input_step_size:
-            if self.input_scale == 'log':
+            if geometry.input_scale == 'log':
                 joystick_input_step_size = 0.1
-            elif self.input_scale == 'linear':
+            elif geometry.input_scale == 'linear':
                 joystick_input_step_size = 10
+        output_format = wheel_angles_export.get_export_format(output, output_format)
         # collect wheel angle data points for a practical input range of center points
-        all_data_points = []
-        center_point_range = self.get_practical_center_point_range()
-        for joystick_val in range(self.joystick_range[0], self.joystick_range[1], joystick_input_step_size):
-            joystick_direction = self.get_joystick_direction(joystick_val)
-            center_point = self.get_scaled_center_point_input_from_joystick_input(joystick_val, joystick_direction)
-            if_angle, of_angle = self.get_wheel_angles_from_center_point(center_point)
-            if joystick_val == 0.0 or joystick_direction == 'center':
-                if_angle = 0.0
-                of_angle = 0.0
-            data = {
-                'input_value': joystick_val,
-                'turn_direction': joystick_direction,
-                'inner_wheel_angle': if_angle,
-                'outer_wheel_angle': of_angle
-            }
-            all_data_points.append(data)
-            print(
-                f"CENTER_POINT: {center_point}, INNER FRONT WHEEL ANGLE: {if_angle}, OUTER FRONT WHEEL ANGLE: {of_angle}")
-        # save the data
-        df = pd.DataFrame(all_data_points)
-        df.to_csv('wheel_angles.csv', index=False)
+        total_rows = wheel_angles_export.get_joystick_grid_size(
+            geometry.joystick_range, joystick_input_step_size, include_endpoint)
+        with wheel_angles_export.open_table_writer(output, output_format) as writer:
+            for start in range(0, total_rows, chunk_size):
+                joystick_vals = wheel_angles_export.get_joystick_grid(
+                    geometry.joystick_range, joystick_input_step_size, start, min(start + chunk_size, total_rows),
+                    include_endpoint)
+                if dtype is not None:
+                    joystick_vals = joystick_vals.astype(dtype)
+                writer.write_chunk(self.get_wheel_angles_table_batch(joystick_vals))
+                if callable(progress):
+                    progress(writer.rows_written, total_rows)
+                elif progress:
+                    print(f"Wheel angles export: {writer.rows_written}/{total_rows} rows written.")
         # notify user
-        print("Wheel angles export table saved to 'wheel_angles.csv'.")
+        if isinstance(output, (str, os.PathLike)):
+            print(f"Wheel angles export table saved to '{output}'.")
         return
 
     def get_scaled_center_point_input_from_joystick_input(self, joystick_val, joystick_direction):
         """
         The diagram from which the equations were derived used LEFT as the reference, therefore this is why
         the output of this function has LEFT as positive and RIGHT as negative.
+        For log input_scale, the joystick value is scaled onto the log of the practical center point range,
+        then turned back into a center point with exp(). So evenly spaced joystick values give exponentially
+        spaced center points, which roughly linearizes the wheel angle response (see README). Right inputs
+        are mirrored onto the left half of the joystick range; get_wheel_angles flips the wheels for them.
         :param joystick_val:
         :param joystick_direction:
         :return:
         """
-        center_point_range = self.get_practical_center_point_range()
-        old_range = self.joystick_range[1] - self.joystick_range[0]
-        new_range = center_point_range[1] - center_point_range[0]
-        scaled_val = (((joystick_val - self.joystick_range[0]) * new_range) / old_range) + center_point_range[0]
+        geometry = self.geometry
+        if geometry.input_scale == 'log':
+            if joystick_direction == 'right':
+                joystick_val = (2 * geometry.joystick_midpoint) - joystick_val
+            return math.exp(geometry.center_point_log_offset + (geometry.center_point_log_slope * joystick_val))
+        new_range = geometry.center_point_range_size
+        scaled_val = ((((joystick_val - geometry.joystick_range[0]) * new_range) / geometry.joystick_range_size)
+                      + geometry.center_point_range[0])
         # for right inputs, we don't want them to keep climbing, we want to reflect the line over the horizontal
         # midpoint value of the new_range so they mirror the left values
         if joystick_direction == 'right':
             scaled_val = scaled_val - new_range
-        # print(joystick_val, old_range, new_range, scaled_val)
+        # print(joystick_val, new_range, scaled_val)
         return scaled_val
 
     def get_joystick_direction(self, joystick_val):
+        geometry = self.geometry
         js_dir = 'center'
-        if joystick_val < self.joystick_midpoint:
+        if joystick_val < geometry.joystick_midpoint:
             js_dir = 'left'
-        elif joystick_val > self.joystick_midpoint:
+        elif joystick_val > geometry.joystick_midpoint:
             js_dir = 'right'
-        self.joystick_direction = js_dir
         return js_dir
 
     def get_wheel_angles(self, joystick_val):
@@ -233,22 +409,73 @@ class RoverWheelAngleCalculator:
         :param joystick_val:
         :return:
         """
-        # the value is now scaled to its appropriate log/linear range. If scaled to log range,
-        # we need to convert the log(center_point) value to an actual center_point value, i.e.
-        # do the inverse of log,
-        if self.input_scale == 'log':
-            joystick_val = 10 ** joystick_val
-        joystick_val = utils.clamp(joystick_val, self.joystick_range[0], self.joystick_range[1])
+        if self.wheel_angles_cache is not None:
+            geometry = self.geometry
+            joystick_val = utils.clamp(joystick_val, geometry.joystick_range[0], geometry.joystick_range[1])
+            return self.wheel_angles_cache.get(joystick_val)
+        return self.get_wheel_angles_uncached(joystick_val)
+
+    def get_wheel_angles_into(self, joystick_val, buffer, offset=0, units_per_degree=None, units_offset=0):
+        """
+        get_wheel_angles, but the 4 angles are written straight into buffer[offset:offset + 4] instead of
+        returned, so a servo command frame (for one or many rovers) can be filled in place and sent as is.
+        buffer is anything writable item by item: a memoryview (e.g. memoryview(frame).cast('h') over a
+        bytearray frame), an array.array or a numpy array. Values are in native byte order.
+
+        With units_per_degree, angles are written as fixed-point integers, round(angle * units_per_degree)
+        + units_offset, e.g. units_per_degree=100 for centidegrees into an array('h').
+
+        :param joystick_val:
+        :param buffer: writable buffer with room for 4 values at offset
+        :param offset: index (in items, not bytes) of the first value
+        :param units_per_degree: None to write float degrees, otherwise integer units per degree
+        :param units_offset: added to fixed-point values, e.g. a servo's center position
+        :return: offset of the next free item, offset + 4
+        """
+        left_front, right_front, left_back, right_back = self.get_wheel_angles(joystick_val)
+        if units_per_degree is None:
+            buffer[offset] = left_front
+            buffer[offset + 1] = right_front
+            buffer[offset + 2] = left_back
+            buffer[offset + 3] = right_back
+        else:
+            buffer[offset] = round(left_front * units_per_degree) + units_offset
+            buffer[offset + 1] = round(right_front * units_per_degree) + units_offset
+            buffer[offset + 2] = round(left_back * units_per_degree) + units_offset
+            buffer[offset + 3] = round(right_back * units_per_degree) + units_offset
+        return offset + 4
+
+    def get_wheel_angles_uncached(self, joystick_val):
+        """
+        get_wheel_angles without the cache.
+        :param joystick_val:
+        :return:
+        """
+        if self.engine == 'lut':
+            return self.get_wheel_angles_from_lut(joystick_val)
+        geometry = self.geometry
+        joystick_val = utils.clamp(joystick_val, geometry.joystick_range[0], geometry.joystick_range[1])
         joystick_direction = self.get_joystick_direction(joystick_val)
-        left_front = 0.0
-        right_front = 0.0
-        left_back = 0.0
-        right_back = 0.0
         # if not turning, all tire angles are 0
         if joystick_val == 0.0 or joystick_direction == 'center':
-            return left_front, right_front, left_back, right_back
+            return 0.0, 0.0, 0.0, 0.0
         # print(joystick_val)
+        return self.get_wheel_angles_for_direction(joystick_val, joystick_direction)
 
+    def get_wheel_angles_for_direction(self, joystick_val, joystick_direction):
+        """
+        Wheel angles for a joystick value that is already clamped and known to be turning 'left' or
+        'right'. Split out of get_wheel_angles so the lookup table can be filled right up to the
+        joystick midpoint from both sides.
+        :param joystick_val:
+        :param joystick_direction: 'left' or 'right'
+        :return:
+        """
+        geometry = self.geometry
+        left_front = 0.0
+        right_front = 0.0
+        left_back = 0.0
+        right_back = 0.0
         # calculate each wheel's angle from the horizontal
         center_point = self.get_scaled_center_point_input_from_joystick_input(joystick_val, joystick_direction)
         # print(center_point)
@@ -263,10 +490,10 @@ class RoverWheelAngleCalculator:
             outer_back = outer_angle
             # translate to actual wheel; left wheels are inner wheels when turning left,
             # right wheels are outer wheels when turning left
-            left_front = utils.clamp(inner_front, -self.theta_max, self.theta_max)
-            right_front = utils.clamp(outer_front, -self.phi_max, self.phi_max)
-            left_back = utils.clamp(inner_back, -self.theta_max, self.theta_max)
-            right_back = utils.clamp(outer_back, -self.phi_max, self.phi_max)
+            left_front = utils.clamp(inner_front, -geometry.theta_max, geometry.theta_max)
+            right_front = utils.clamp(outer_front, -geometry.phi_max, geometry.phi_max)
+            left_back = utils.clamp(inner_back, -geometry.theta_max, geometry.theta_max)
+            right_back = utils.clamp(outer_back, -geometry.phi_max, geometry.phi_max)
         elif joystick_direction == 'right':
             # calculate relative wheels to turn
             # if turning right, front tire angles are positive, back tire angles are negative
@@ -276,15 +503,427 @@ class RoverWheelAngleCalculator:
             outer_back = -1 * outer_angle
             # translate to actual wheel; left wheels are outer wheels when turning right,
             # right wheels are inner wheels when turning right
-            left_front = utils.clamp(outer_front, -self.phi_max, self.phi_max)
-            right_front = utils.clamp(inner_front, -self.theta_max, self.theta_max)
-            left_back = utils.clamp(outer_back, -self.phi_max, self.phi_max)
-            right_back = utils.clamp(inner_back, -self.theta_max, self.theta_max)
+            left_front = utils.clamp(outer_front, -geometry.phi_max, geometry.phi_max)
+            right_front = utils.clamp(inner_front, -geometry.theta_max, geometry.theta_max)
+            left_back = utils.clamp(outer_back, -geometry.phi_max, geometry.phi_max)
+            right_back = utils.clamp(inner_back, -geometry.theta_max, geometry.theta_max)
         return left_front, right_front, left_back, right_back
 
+    def get_wheel_angles_batch(self, joystick_vals, chunk_size=BATCH_CHUNK_SIZE, out=None, dtype=None):
+        """
+        Vectorized version of get_wheel_angles for a whole array of joystick values, e.g. a recorded
+        drive log. Left/right/center handling and theta_max/phi_max clamping are the same as the
+        scalar path, row by row (NaN joystick values don't turn, all angles 0).
+
+        The array is worked through in chunks so the temporaries stay in cache; one giant pass over
+        millions of values is actually slower.
+
+        :param joystick_vals: array-like of joystick values (any shape, it gets flattened)
+        :param chunk_size: number of joystick values computed per pass
+        :param out: optional (N, 4) float array to write the angles into instead of allocating one, e.g. a
+            view into a bigger frame buffer
+        :param dtype: precision to compute in, np.float64 (default, or out's dtype if out is given) or
+            np.float32. float32 halves the memory traffic and fits twice as many values per SIMD
+            instruction, for errors under 1e-4 degrees (see tests/float32_accuracy_test.py)
+        :return: (N, 4) numpy array with columns (left_front, right_front, left_back, right_back)
+        """
+        np = utils.import_numpy()
+        if dtype is None:
+            dtype = out.dtype if out is not None else np.float64
+        dtype = np.dtype(dtype)
+        if dtype not in [np.float32, np.float64]:
+            raise Exception("Error: dtype must be float32 or float64.")
+        joystick_vals = np.asarray(joystick_vals, dtype=dtype).ravel()
+        if out is None:
+            wheel_angles = np.empty((joystick_vals.shape[0], 4), dtype=dtype)
+        else:
+            if out.shape != (joystick_vals.shape[0], 4):
+                raise Exception(f"Error: out must have shape ({joystick_vals.shape[0]}, 4), not {out.shape}.")
+            wheel_angles = out
+        for start in range(0, joystick_vals.shape[0], chunk_size):
+            stop = start + chunk_size
+            self._fill_wheel_angles_batch(joystick_vals[start:stop], wheel_angles[start:stop])
+        return wheel_angles
+
+    def _fill_wheel_angles_batch(self, joystick_vals, out):
+        np = utils.import_numpy()
+        geometry = self.geometry
+        # np.clip is slower than the two of these
+        joystick_vals = np.maximum(joystick_vals, geometry.joystick_range[0])
+        np.minimum(joystick_vals, geometry.joystick_range[1], out=joystick_vals)
+        is_left = joystick_vals < geometry.joystick_midpoint
+        is_right = joystick_vals > geometry.joystick_midpoint
+        # same rule as the scalar path, a value of exactly 0 doesn't turn either
+        is_turning = joystick_vals != 0.0
+        is_left &= is_turning
+        is_right &= is_turning
+        # scale joystick values to center points, right inputs are reflected so they mirror the left
+        center_points = self.get_scaled_center_point_input_from_joystick_input_batch(joystick_vals, is_right)
+        return fill_wheel_angles_batch(
+            center_points, is_left, is_right, out,
+            theta_max=geometry.theta_max,
+            phi_max=geometry.phi_max,
+            distance_between_front_pivots=geometry.distance_between_front_pivots,
+            distance_between_axels=geometry.distance_between_axels,
+            wheel_gap_distance=geometry.wheel_gap_distance,
+        )
+
+    def build_wheel_angles_lut(self, lut_resolution=DEFAULT_LUT_RESOLUTION):
+        """
+        Precompute wheel angles over joystick_range for engine='lut'. Angles jump at the joystick
+        midpoint (left turns on one side, right turns on the other), so each side gets its own table
+        that runs right up to the midpoint and lookups never interpolate across it.
+        :param lut_resolution: number of table entries over the whole joystick_range
+        :return: dict with the left and right tables and their step sizes. Tables are flat, 4 wheel angles
+            per entry one after the other, so they can just as well be a memoryview of a table file.
+        """
+        geometry = self.geometry
+        if lut_resolution < 4:
+            raise Exception("Error: lut_resolution must be at least 4.")
+        side_size = int(math.ceil(lut_resolution / 2))
+        lut = {}
+        for joystick_direction, side_range in (('left', (geometry.joystick_range[0], geometry.joystick_midpoint)),
+                                               ('right', (geometry.joystick_midpoint, geometry.joystick_range[1]))):
+            step = (side_range[1] - side_range[0]) / (side_size - 1)
+            table = []
+            for ix in range(side_size):
+                joystick_val = side_range[0] + ix * step
+                table.extend(self.get_wheel_angles_for_direction(joystick_val, joystick_direction))
+            lut[joystick_direction] = {
+                'start': side_range[0],
+                'step': step,
+                'table': table,
+            }
+        return lut
 
+    def get_wheel_angles_from_lut(self, joystick_val):
+        """
+        Same as get_wheel_angles but linearly interpolated from the precomputed table, so there is no
+        trig at all on the hot path.
+        :param joystick_val:
+        :return:
+        """
+        geometry = self.geometry
+        joystick_val = utils.clamp(joystick_val, geometry.joystick_range[0], geometry.joystick_range[1])
+        if joystick_val == 0.0:
+            return 0.0, 0.0, 0.0, 0.0
+        if joystick_val < geometry.joystick_midpoint:
+            side = self.lut['left']
+        elif joystick_val > geometry.joystick_midpoint:
+            side = self.lut['right']
+        else:
+            # the midpoint, or NaN, doesn't turn, same as get_wheel_angles_uncached
+            return 0.0, 0.0, 0.0, 0.0
+        table = side['table']
+        position = (joystick_val - side['start']) / side['step']
+        ix = min(int(position), (len(table) // 4) - 2)
+        fraction = position - ix
+        # entries ix and ix + 1, 4 wheel angles each (one slice is quicker than 8 lookups)
+        lower_0, lower_1, lower_2, lower_3, upper_0, upper_1, upper_2, upper_3 = table[ix * 4:(ix * 4) + 8]
+        return (
+            lower_0 + (upper_0 - lower_0) * fraction,
+            lower_1 + (upper_1 - lower_1) * fraction,
+            lower_2 + (upper_2 - lower_2) * fraction,
+            lower_3 + (upper_3 - lower_3) * fraction,
+        )
+
+    def load_wheel_angles_lut_file(self, lut_dir):
+        """
+        Lookup table memory-mapped from lut_dir, compiling the file first if this geometry doesn't have one
+        yet. Every process using the same geometry maps the same file, so the table is in memory once.
+        :param lut_dir: directory of table files, see wheel_angles_table_file
+        :return: (lut, lut_max_error)
+        """
+        path = wheel_angles_table_file.get_table_path(lut_dir, self.geometry, self.lut_resolution)
+        if not os.path.exists(path):
+            self.compile_wheel_angles_lut_file(lut_dir)
+        return wheel_angles_table_file.read_table_file(path, self.geometry, self.lut_resolution)
 
+    def compile_wheel_angles_lut_file(self, lut_dir):
+        """
+        Compute the lookup table for this geometry and lut_resolution and write it to lut_dir, e.g. once
+        at deploy time so workers started with lut_dir never compute anything.
+        :param lut_dir: directory of table files
+        :return: path of the table file
+        """
+        os.makedirs(lut_dir, exist_ok=True)
+        path = wheel_angles_table_file.get_table_path(lut_dir, self.geometry, self.lut_resolution)
+        lut = self.build_wheel_angles_lut(self.lut_resolution)
+        wheel_angles_table_file.write_table_file(
+            path, self.geometry, self.lut_resolution, lut, self.get_lut_max_error(lut=lut))
+        return path
+
+    def get_lut_max_error(self, samples_per_step=8, lut=None):
+        """
+        Maximum absolute difference (degrees) between the lookup table and the exact calculation,
+        checked at several points between every pair of table entries. Plain Python like the table
+        itself, so engine='lut' doesn't need numpy.
+        :param samples_per_step: number of check points per table step
+        :param lut: table to check, the calculator's own by default
+        :return:
+        """
+        if lut is None:
+            lut = self.lut
+        if not lut:
+            raise Exception("Error: no lookup table, construct the calculator with engine='lut'.")
+        max_error = 0.0
+        for joystick_direction, side in lut.items():
+            table = side['table']
+            num_entries = len(table) // 4
+            num_samples = (num_entries - 1) * samples_per_step + 1
+            for sample_ix in range(num_samples):
+                # skip the midpoint end of each side, that one isn't turning
+                if joystick_direction == 'left' and sample_ix == num_samples - 1:
+                    continue
+                if joystick_direction == 'right' and sample_ix == 0:
+                    continue
+                position = sample_ix / samples_per_step
+                joystick_val = side['start'] + side['step'] * position
+                # nor exactly 0 (when it's inside the range), get_wheel_angles_from_lut returns 0 there
+                # without looking at the table
+                if joystick_val == 0.0:
+                    continue
+                ix = min(int(position), num_entries - 2)
+                fraction = position - ix
+                exact = self.get_wheel_angles_for_direction(joystick_val, joystick_direction)
+                for column in range(4):
+                    lower = table[ix * 4 + column]
+                    upper = table[(ix + 1) * 4 + column]
+                    max_error = max(max_error, abs(lower + (upper - lower) * fraction - exact[column]))
+        return max_error
+
+    def get_joystick_values_from_center_points_batch(self, center_points, joystick_direction):
+        """
+        Inverse of get_scaled_center_point_input_from_joystick_input_batch for one turn direction.
+        :param center_points: numpy array of center points
+        :param joystick_direction: 'left' or 'right'
+        :return: numpy array of joystick values (NaN where log scale can't reach the center point)
+        """
+        np = utils.import_numpy()
+        geometry = self.geometry
+        if geometry.input_scale == 'log':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                log_center_points = np.where(center_points > 0, np.log(np.where(center_points > 0, center_points, 1.0)), np.nan)
+            joystick_vals = (log_center_points - geometry.center_point_log_offset) / geometry.center_point_log_slope
+            if joystick_direction == 'right':
+                joystick_vals = (2 * geometry.joystick_midpoint) - joystick_vals
+            return joystick_vals
+        if joystick_direction == 'right':
+            center_points = center_points + geometry.center_point_range_size
+        return (((center_points - geometry.center_point_range[0]) * geometry.joystick_range_size)
+                / geometry.center_point_range_size) + geometry.joystick_range[0]
 
+    def get_joystick_values_from_wheel_angles_batch(self, wheel_angles, joystick_direction='left', wheel='inner'):
+        """
+        Inverse of get_wheel_angles: the joystick value that turns the inner (or outer) front wheel by
+        wheel_angle degrees while turning in joystick_direction. Closed form: the wheel angle gives the
+        wheel's turn radius, Pythagoras gives the center point, and undoing the joystick scaling gives the
+        joystick value. Only joystick values on the joystick_direction side of the midpoint count, i.e.
+        the practical center point range is respected.
+
+        If the exact angle can't be reached (beyond the steering limit, or gentler than the practical
+        range allows), the joystick value that gets closest is returned instead, e.g. full deflection.
+        The midpoint (straight ahead, 0 degrees) is one of the choices, so angles smaller than the
+        gentlest turn the practical range allows come back as the midpoint rather than a sliver off it.
+        Only the size of the angle matters, the sign is ignored.
+
+        :param wheel_angles: array-like of wheel angles in degrees
+        :param joystick_direction: 'left' or 'right'
+        :param wheel: 'inner' or 'outer'
+        :return: numpy array of joystick values
+        """
+        np = utils.import_numpy()
+        if joystick_direction not in ['left', 'right']:
+            raise Exception("Error: joystick_direction must be 'left' or 'right'.")
+        if wheel not in ['inner', 'outer']:
+            raise Exception("Error: wheel must be 'inner' or 'outer'.")
+        geometry = self.geometry
+        target_angles = np.abs(np.asarray(wheel_angles, dtype=np.float64).ravel())
+        # the inner wheel's triangle has its bottom edge shifted by the distance between the front pivots
+        if wheel == 'inner':
+            turn_radius_offset = -geometry.wheel_gap_distance
+            center_point_offset = geometry.distance_between_front_pivots
+        else:
+            turn_radius_offset = geometry.wheel_gap_distance
+            center_point_offset = 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            turn_radius = (geometry.distance_between_axels / np.sin(np.radians(target_angles))) + turn_radius_offset
+            bottom_edge = np.sqrt((turn_radius ** 2) - geometry.distance_between_axels_squared)
+
+        # candidates: both square roots, plus both ends of this direction's side of the joystick range
+        # (just off the midpoint, since the midpoint itself doesn't turn) for targets out of reach, plus
+        # the midpoint
+        if joystick_direction == 'left':
+            side_range = (geometry.joystick_range[0], np.nextafter(geometry.joystick_midpoint, -np.inf))
+        else:
+            side_range = (np.nextafter(geometry.joystick_midpoint, np.inf), geometry.joystick_range[1])
+        candidates = np.empty((target_angles.shape[0], 5), dtype=np.float64)
+        candidates[:, 0] = self.get_joystick_values_from_center_points_batch(
+            center_point_offset + bottom_edge, joystick_direction)
+        candidates[:, 1] = self.get_joystick_values_from_center_points_batch(
+            center_point_offset - bottom_edge, joystick_direction)
+        candidates[:, 2] = side_range[0]
+        candidates[:, 3] = side_range[1]
+        candidates[:, :4][(candidates[:, :4] < side_range[0]) | (candidates[:, :4] > side_range[1])] = np.nan
+        # and the midpoint itself (straight ahead, 0 degrees): even the gentlest turn is a couple of degrees,
+        # so smaller targets are closer to not turning at all. Last, so ties go to an actual turn.
+        candidates[:, 4] = geometry.joystick_midpoint
+
+        # pick the candidate whose wheel angle is closest to the target
+        wheel_angles = np.abs(self.get_wheel_angles_batch(np.nan_to_num(candidates)))
+        # left turns: left wheels are inner. right turns: right wheels are inner
+        column = 0 if (joystick_direction == 'left') == (wheel == 'inner') else 1
+        angle_error = np.abs(wheel_angles[:, column].reshape(candidates.shape) - target_angles[:, np.newaxis])
+        angle_error[np.isnan(candidates) | np.isnan(angle_error)] = np.inf
+        best = np.argmin(angle_error, axis=1)
+        return candidates[np.arange(candidates.shape[0]), best]
+
+    def get_joystick_value_from_wheel_angle(self, wheel_angle, joystick_direction='left', wheel='inner'):
+        """
+        Scalar version of get_joystick_values_from_wheel_angles_batch.
+        :return:
+        """
+        return float(self.get_joystick_values_from_wheel_angles_batch([wheel_angle], joystick_direction, wheel)[0])
+
+    def get_joystick_values_from_turn_radii_batch(self, turn_radii, joystick_direction='left', wheel='inner'):
+        """
+        Same as get_joystick_values_from_wheel_angles_batch, but for a target turn radius of the inner (or
+        outer) front wheel, as in get_wheel_turn_radius_inner_front/get_wheel_turn_radius_outer_front.
+        :param turn_radii: array-like of turn radii
+        :return: numpy array of joystick values
+        """
+        np = utils.import_numpy()
+        geometry = self.geometry
+        turn_radii = np.asarray(turn_radii, dtype=np.float64).ravel()
+        if wheel == 'inner':
+            val = geometry.distance_between_axels / (turn_radii + geometry.wheel_gap_distance)
+        else:
+            val = geometry.distance_between_axels / (turn_radii - geometry.wheel_gap_distance)
+        wheel_angles = np.degrees(np.arcsin(np.clip(val, -1.0, 1.0)))
+        return self.get_joystick_values_from_wheel_angles_batch(wheel_angles, joystick_direction, wheel)
+
+    def get_joystick_value_from_turn_radius(self, turn_radius, joystick_direction='left', wheel='inner'):
+        """
+        Scalar version of get_joystick_values_from_turn_radii_batch.
+        :return:
+        """
+        return float(self.get_joystick_values_from_turn_radii_batch([turn_radius], joystick_direction, wheel)[0])
 
+    def get_cache_stats(self):
+        """
+        Hits, misses, evictions etc. of the get_wheel_angles cache, see WheelAnglesCache.get_stats.
+        :return: dict, or None if the calculator was made without cache_size
+        """
+        if self.wheel_angles_cache is None:
+            return None
+        return self.wheel_angles_cache.get_stats()
 
+    def enable_instrumentation(self):
+        """
+        Start timing the stages of get_wheel_angles (direction, scaling, trig, clamping...), see
+        wheel_angles_instrumentation. Costs a few microseconds per call while on, nothing once disabled.
+        :return: the WheelAnglesInstrumentation, for get_snapshot/format_prometheus/format_json
+        """
+        if self.instrumentation is None:
+            self.instrumentation = wheel_angles_instrumentation.WheelAnglesInstrumentation(self)
+            self.instrumentation.install()
+        return self.instrumentation
 
+    def disable_instrumentation(self):
+        """
+        Stop timing and put the plain methods back.
+        :return: the final snapshot, or None if instrumentation wasn't on
+        """
+        if self.instrumentation is None:
+            return None
+        self.instrumentation.uninstall()
+        snapshot = self.instrumentation.get_snapshot()
+        self.instrumentation = None
+        return snapshot
+
+    def get_instrumentation_snapshot(self):
+        """
+        :return: see WheelAnglesInstrumentation.get_snapshot, or None if instrumentation isn't on
+        """
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.get_snapshot()
+
+
+def fill_wheel_angles_batch(center_points, is_left, is_right, out,
+                            theta_max,
+                            phi_max,
+                            distance_between_front_pivots,
+                            distance_between_axels,
+                            wheel_gap_distance
+                            ):
+    """
+    The vectorized wheel angle math behind RoverWheelAngleCalculator.get_wheel_angles_batch and
+    FleetWheelAngleCalculator: center points to the 4 signed, clamped wheel angles. The geometry constants
+    are numbers (one rover) or arrays that broadcast against center_points (one entry per rover of a fleet).
+    Everything is computed in center_points' precision.
+    :param center_points: numpy array of center points, see get_scaled_center_point_input_from_joystick_input_batch
+    :param is_left: boolean numpy array, True where turning left
+    :param is_right: boolean numpy array, True where turning right (neither means not turning, all angles 0)
+    :param out: numpy array of shape center_points.shape + (4,) to write
+        (left_front, right_front, left_back, right_back) into
+    :return: out
+    """
+    np = utils.import_numpy()
+    # the geometry constants have to be in that precision too, or numpy would quietly promote float32
+    # work back to float64
+    dtype = center_points.dtype
+    theta_max = np.asarray(theta_max, dtype=dtype)
+    phi_max = np.asarray(phi_max, dtype=dtype)
+    distance_between_front_pivots = np.asarray(distance_between_front_pivots, dtype=dtype)
+    distance_between_axels = np.asarray(distance_between_axels, dtype=dtype)
+    wheel_gap_distance = np.asarray(wheel_gap_distance, dtype=dtype)
+    distance_between_axels_squared = distance_between_axels * distance_between_axels
+    # arithmetic with boolean arrays casts them every time, so make float 0/1 masks once
+    left = is_left.astype(dtype)
+    right = is_right.astype(dtype)
+    # -1 turning left, 1 turning right, 0 if not turning (so all tire angles are 0), times degrees per
+    # radian so one multiply turns the arcsin into signed degrees
+    sign_degrees = right - left
+    sign_degrees *= np.degrees(np.asarray(1.0, dtype=dtype))
+
+    # the left wheels are inner wheels when turning left and outer wheels when turning right,
+    # and the other way around for the right wheels. Rather than computing inner and outer angles
+    # and then picking per row, plug the right terms of each equation into every row directly.
+    val = np.empty(center_points.shape, dtype=dtype)
+    angle_max = np.empty(center_points.shape, dtype=dtype)
+    scratch = np.empty(center_points.shape, dtype=dtype)
+    for column, inner, outer in ((0, left, right), (1, right, left)):
+        # inner: x = center_point - c, radius + (a-c)/2. outer: x = center_point, radius - (a-c)/2
+        np.multiply(inner, distance_between_front_pivots, out=val)
+        np.subtract(center_points, val, out=val)
+        val *= val
+        val += distance_between_axels_squared
+        np.sqrt(val, out=val)
+        np.multiply(inner, 2 * wheel_gap_distance, out=scratch)
+        val += scratch
+        val -= wheel_gap_distance
+        np.divide(distance_between_axels, val, out=val)
+        # np.clip costs as much as both of these
+        np.maximum(val, -1.0, out=val)
+        np.minimum(val, 1.0, out=val)
+        np.arcsin(val, out=val)
+        # turning left, front angles are negative; turning right, front angles are positive
+        val *= sign_degrees
+        # inner wheels are limited by theta_max, outer wheels by phi_max. A row turns one way or not at
+        # all, so the limit is inner * theta_max + outer * phi_max, exactly (the masks are 0 or 1, and rows
+        # that don't turn are already 0). The limits are symmetric, so the sign being on doesn't matter.
+        # fmin/fmax rather than minimum/maximum so a NaN joystick value (a row that isn't turning, with a
+        # limit of 0) comes out as 0 like the scalar path instead of NaN.
+        np.multiply(inner, theta_max, out=angle_max)
+        np.multiply(outer, phi_max, out=scratch)
+        angle_max += scratch
+        np.fmin(val, angle_max, out=val)
+        np.negative(angle_max, out=angle_max)
+        np.fmax(val, angle_max, out=out[..., column])
+        # back wheels mirror the front wheels (a column at a time, numpy is several times slower going
+        # through out[..., 0:2] in rows of 2)
+        np.negative(out[..., column], out=out[..., column + 2])
+    # rows that aren't turning end up as -0.0 or 0.0, make them all 0.0
+    out += 0.0
+    return out
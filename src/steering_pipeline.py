@@ -0,0 +1,129 @@
+"""
+Asyncio pipeline stage from joystick samples to wheel angles, for teleop where joystick events arrive
+much faster than the servos can act on them.
+
+    pipeline = SteeringPipeline(RoverWheelAngleCalculator(), rate_hz=50)
+    async for left_front, right_front, left_back, right_back in pipeline.run(joystick_samples):
+        send_to_servos(left_front, right_front, left_back, right_back)
+
+joystick_samples is any async iterator of joystick values (e.g. parsed off a socket). Samples are read
+as fast as they come in, but only the latest one per control tick is used; the ones it replaced count
+as dropped. Wheel angles come out once per tick, and are only recomputed when the joystick value
+changed.
+"""
+import asyncio
+
+
+class SteeringPipeline:
+    """
+    Coalesces joystick samples down to the latest value per control tick and yields wheel angles
+    at rate_hz. See get_metrics for the dropped event / backpressure counters.
+    """
+
+    def __init__(self, wheel_angle_calculator, rate_hz=50):
+        """
+        :param wheel_angle_calculator: RoverWheelAngleCalculator
+        :param rate_hz: control ticks per second, i.e. how often wheel angles are yielded
+        """
+        if rate_hz <= 0:
+            raise Exception("Error: rate_hz must be greater than 0.")
+        self.wheel_angle_calculator = wheel_angle_calculator
+        self.rate_hz = rate_hz
+        self.latest_joystick_val = None
+        self.sample_pending = False
+        self.reset_metrics()
+        return
+
+    def reset_metrics(self):
+        self.events_received = 0  # samples read from the input
+        self.events_dropped = 0  # samples replaced by a newer one before a tick used them
+        self.ticks = 0  # wheel angles yielded
+        self.computations = 0  # ticks that called get_wheel_angles
+        self.skipped_unchanged = 0  # ticks with a new sample equal to the last one, so nothing recomputed
+        self.late_ticks = 0  # ticks that started late because the consumer (or the event loop) was slow
+        self.missed_ticks = 0  # whole ticks skipped to catch back up after running late
+        self.max_tick_lag = 0.0  # seconds, worst lateness of a tick
+        return
+
+    def get_metrics(self):
+        """
+        :return: dict of the counters, plus drop_rate (fraction of received samples dropped)
+        """
+        return {
+            'events_received': self.events_received,
+            'events_dropped': self.events_dropped,
+            'drop_rate': self.events_dropped / self.events_received if self.events_received else 0.0,
+            'ticks': self.ticks,
+            'computations': self.computations,
+            'skipped_unchanged': self.skipped_unchanged,
+            'late_ticks': self.late_ticks,
+            'missed_ticks': self.missed_ticks,
+            'max_tick_lag': self.max_tick_lag,
+        }
+
+    async def read_samples(self, joystick_samples):
+        """
+        Keep only the latest sample, counting the ones that never made it to a tick.
+        """
+        async for joystick_val in joystick_samples:
+            self.events_received += 1
+            if self.sample_pending:
+                self.events_dropped += 1
+            self.latest_joystick_val = joystick_val
+            self.sample_pending = True
+        return
+
+    async def run(self, joystick_samples):
+        """
+        Async generator of (left_front, right_front, left_back, right_back) wheel angles, one per tick,
+        starting from the first sample. Finishes once joystick_samples is exhausted and its last sample
+        has been used.
+        :param joystick_samples: async iterator of joystick values
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        tick_period = 1.0 / self.rate_hz
+        self.sample_pending = False
+        reader = asyncio.ensure_future(self.read_samples(joystick_samples))
+        last_joystick_val = None
+        wheel_angles = None
+        try:
+            next_tick = loop.time()
+            while True:
+                delay = next_tick - loop.time()
+                # always give the reader a chance to run, even when running behind
+                await asyncio.sleep(max(delay, 0))
+                if reader.done() and reader.exception() is not None:
+                    raise reader.exception()
+                if self.sample_pending:
+                    self.sample_pending = False
+                    joystick_val = self.latest_joystick_val
+                    if wheel_angles is None or joystick_val != last_joystick_val:
+                        wheel_angles = self.wheel_angle_calculator.get_wheel_angles(joystick_val)
+                        last_joystick_val = joystick_val
+                        self.computations += 1
+                    else:
+                        self.skipped_unchanged += 1
+                elif reader.done():
+                    break
+                if wheel_angles is not None:
+                    self.ticks += 1
+                    yield wheel_angles
+
+                # schedule the next tick; if we're already past it, skip ahead instead of bursting
+                next_tick += tick_period
+                lag = loop.time() - next_tick
+                if lag > 0:
+                    self.late_ticks += 1
+                    self.max_tick_lag = max(self.max_tick_lag, lag)
+                    missed = int(lag / tick_period)
+                    self.missed_ticks += missed
+                    next_tick += missed * tick_period
+        finally:
+            if not reader.done():
+                reader.cancel()
+                try:
+                    await reader
+                except asyncio.CancelledError:
+                    pass
+        return
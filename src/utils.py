@@ -8,3 +8,16 @@ def clamp(val, min_val, max_val):
     return val
 
 
+
+
+def import_numpy():
+    """
+    numpy is only needed for the batch/vectorized calculations, so it's imported when one of those is
+    first used rather than with the steering core.
+    :return: the numpy module
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise Exception("Error: batch calculations need numpy. Install it with 'pip install numpy'.")
+    return numpy
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+
+
+CACHE_EVICTION_POLICIES = ['lru', 'fifo']
+
+
+class WheelAnglesCache:
+    """
+    Bounded cache of get_wheel_angles results, keyed on the clamped joystick value. Joysticks report a
+    few hundred distinct values at most and an operator holds steady most of the time, so repeat inputs
+    come out of a dict instead of redoing the trig.
+
+    With a quantum, joystick values are rounded to the nearest multiple of it first and the angles are
+    computed for the rounded value, so e.g. quantum=0.5 caps a [-100, 100] joystick at 401 entries.
+    Without one, only exactly equal values share an entry.
+
+    Eviction is 'lru' (least recently used goes first) or 'fifo' (oldest entry goes first, hits don't
+    reorder anything). Safe to share between threads, lookups hold a lock.
+    """
+
+    def __init__(self, compute, max_size=1024, quantum=None, eviction='lru'):
+        """
+        :param compute: function of one joystick value returning the wheel angles, called on a miss
+        :param max_size: entries kept before evicting
+        :param quantum: joystick value resolution to round to, None for exact values
+        :param eviction: 'lru' or 'fifo'
+        """
+        if max_size < 1:
+            raise Exception("Error: cache max_size must be at least 1.")
+        if quantum is not None and quantum <= 0:
+            raise Exception("Error: cache quantum must be greater than 0.")
+        if eviction not in CACHE_EVICTION_POLICIES:
+            raise Exception(f"Error: cache eviction must be one of {CACHE_EVICTION_POLICIES}.")
+        self.compute = compute
+        self.max_size = max_size
+        self.quantum = quantum
+        self.eviction = eviction
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        return
+
+    def __getstate__(self):
+        # locks can't be pickled (or deep copied), the copy gets a fresh one
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        return
+
+    def get(self, joystick_val):
+        """
+        Cached wheel angles for an already clamped joystick value.
+        :param joystick_val:
+        :return:
+        """
+        # NaN can't be rounded to a key and never equals one anyway, so it skips the cache
+        if joystick_val != joystick_val:
+            return self.compute(joystick_val)
+        if self.quantum is None:
+            key = joystick_val
+        else:
+            key = round(joystick_val / self.quantum)
+        with self.lock:
+            wheel_angles = self.entries.get(key)
+            if wheel_angles is not None:
+                self.hits += 1
+                if self.eviction == 'lru':
+                    self.entries.move_to_end(key)
+                return wheel_angles
+            self.misses += 1
+        # compute outside the lock so a miss doesn't hold up every other thread
+        if self.quantum is None:
+            wheel_angles = self.compute(joystick_val)
+        else:
+            wheel_angles = self.compute(key * self.quantum)
+        with self.lock:
+            if key not in self.entries and len(self.entries) >= self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self.entries[key] = wheel_angles
+        return wheel_angles
+
+    def clear(self):
+        """
+        Drop every entry, e.g. because the geometry changed. Hit/miss counts are kept.
+        :return:
+        """
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+        return
+
+    def get_stats(self):
+        """
+        :return: dict of hits, misses, evictions, invalidations, size, max_size and hit_rate
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,215 @@
+import math
+import os
+import numpy as np
+
+
+# rows computed and written per chunk by RoverWheelAngleCalculator.export_wheel_angles_table
+EXPORT_CHUNK_SIZE = 65536
+
+# how close (in steps) a grid point has to be to the end of the joystick range to count as on it
+GRID_TOLERANCE = 1e-9
+
+EXPORT_FORMATS = ['csv', 'parquet', 'feather', 'binary']
+
+EXPORT_COLUMNS = ['input_value', 'turn_direction', 'inner_wheel_angle', 'outer_wheel_angle']
+
+# turn direction codes used by the 'binary' format (and internally), indexed by code + 1
+TURN_DIRECTIONS = np.array(['left', 'center', 'right'])
+
+
+def get_export_format(output, output_format=None):
+    """
+    Work out the export format from the file extension if it wasn't given. File objects without a
+    name default to csv.
+    :param output: path or file object
+    :param output_format: 'csv', 'parquet', 'feather', 'binary' or None
+    :return:
+    """
+    if output_format is None:
+        name = output if isinstance(output, (str, os.PathLike)) else getattr(output, 'name', '')
+        extension = os.path.splitext(str(name))[1].lower()
+        output_format = {
+            '.parquet': 'parquet',
+            '.feather': 'feather',
+            '.arrow': 'feather',
+            '.bin': 'binary',
+            '.f32': 'binary',
+        }.get(extension, 'csv')
+    if output_format not in EXPORT_FORMATS:
+        raise Exception(f"Error: output_format must be one of {EXPORT_FORMATS}.")
+    return output_format
+
+
+def get_joystick_grid_size(joystick_range, step, include_endpoint=False):
+    """
+    Number of joystick values from joystick_range[0] to joystick_range[1] every step. Same as
+    len(range(...)) for whole number steps, but works with any step size.
+    :param joystick_range: [min val, max val]
+    :param step: step size, can be fractional
+    :param include_endpoint: also include joystick_range[1] as the last value (range() leaves it off)
+    :return:
+    """
+    if step <= 0:
+        raise Exception("Error: joystick_input_step_size must be greater than 0.")
+    num_steps = (joystick_range[1] - joystick_range[0]) / step
+    # steps like 0.1 don't divide the range exactly in floating point, so allow a little slop
+    # before deciding whether the endpoint lands on the grid
+    whole_steps = math.floor(num_steps + GRID_TOLERANCE)
+    grid_size = max(whole_steps, 0)
+    if abs(num_steps - whole_steps) > GRID_TOLERANCE:
+        grid_size += 1
+    if include_endpoint:
+        grid_size += 1
+    return grid_size
+
+
+def get_joystick_grid(joystick_range, step, start_ix, stop_ix, include_endpoint=False):
+    """
+    Joystick values start_ix up to stop_ix of the grid described by get_joystick_grid_size, in one
+    vectorized pass. Whole number ranges and steps give an integer array.
+    :return:
+    """
+    grid = joystick_range[0] + np.arange(start_ix, stop_ix) * step
+    # snap the last value onto the endpoint so it doesn't come out as e.g. 99.99999999999997
+    if include_endpoint and len(grid) and stop_ix == get_joystick_grid_size(joystick_range, step, include_endpoint):
+        grid = grid.astype(np.result_type(grid, joystick_range[1]), copy=False)
+        grid[-1] = joystick_range[1]
+    return grid
+
+
+def open_table_writer(output, output_format):
+    writers = {
+        'csv': CsvTableWriter,
+        'parquet': ParquetTableWriter,
+        'feather': FeatherTableWriter,
+        'binary': BinaryTableWriter,
+    }
+    return writers[output_format](output)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise Exception("Error: parquet and feather export need pyarrow. Install it with 'pip install pyarrow'.")
+    return pyarrow
+
+
+class TableWriter:
+    """
+    Writes the wheel angles table one chunk at a time, so nothing but the current chunk is ever held
+    in memory. Chunks are dicts of equal length numpy arrays keyed by EXPORT_COLUMNS, with
+    'turn_direction' as codes (-1 left, 0 center, 1 right).
+
+    Paths are opened (and closed) by the writer; file objects are written to and left open.
+    """
+    binary_mode = True
+
+    def __init__(self, output):
+        self.owns_file = isinstance(output, (str, os.PathLike))
+        if self.owns_file:
+            if self.binary_mode:
+                self.file = open(output, 'wb')
+            else:
+                self.file = open(output, 'w', newline='')
+        else:
+            self.file = output
+        self.rows_written = 0
+        return
+
+    def write_chunk(self, chunk):
+        self.rows_written += len(chunk['input_value'])
+        return
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return
+
+
+class CsvTableWriter(TableWriter):
+    binary_mode = False
+
+    def __init__(self, output):
+        super().__init__(output)
+        # only csv export needs pandas, so it isn't imported until then
+        import pandas
+        self.pandas = pandas
+        return
+
+    def write_chunk(self, chunk):
+        df = self.pandas.DataFrame({
+            'input_value': chunk['input_value'],
+            'turn_direction': TURN_DIRECTIONS[chunk['turn_direction'] + 1],
+            'inner_wheel_angle': chunk['inner_wheel_angle'],
+            'outer_wheel_angle': chunk['outer_wheel_angle'],
+        })
+        df.to_csv(self.file, header=self.rows_written == 0, index=False)
+        return super().write_chunk(chunk)
+
+
+class ParquetTableWriter(TableWriter):
+    """
+    Every chunk becomes one parquet row group.
+    """
+
+    def __init__(self, output):
+        super().__init__(output)
+        self.pyarrow = _import_pyarrow()
+        import pyarrow.parquet
+        self.writer = None
+        return
+
+    def to_record_batch(self, chunk):
+        return self.pyarrow.record_batch([
+            self.pyarrow.array(chunk['input_value']),
+            self.pyarrow.array(TURN_DIRECTIONS[chunk['turn_direction'] + 1]),
+            self.pyarrow.array(chunk['inner_wheel_angle']),
+            self.pyarrow.array(chunk['outer_wheel_angle']),
+        ], names=EXPORT_COLUMNS)
+
+    def open_writer(self, schema):
+        return self.pyarrow.parquet.ParquetWriter(self.file, schema)
+
+    def write_chunk(self, chunk):
+        batch = self.to_record_batch(chunk)
+        if self.writer is None:
+            self.writer = self.open_writer(batch.schema)
+        self.writer.write_batch(batch)
+        return super().write_chunk(chunk)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        return super().close()
+
+
+class FeatherTableWriter(ParquetTableWriter):
+    """
+    Feather v2 is the Arrow IPC file format; every chunk becomes one record batch.
+    """
+
+    def open_writer(self, schema):
+        return self.pyarrow.ipc.new_file(self.file, schema)
+
+
+class BinaryTableWriter(TableWriter):
+    """
+    Raw little endian float32 rows of (input_value, turn_direction, inner_wheel_angle, outer_wheel_angle)
+    with no header, where turn_direction is -1 left, 0 center, 1 right. Read it back with
+    np.fromfile(path, dtype='<f4').reshape(-1, 4).
+    """
+
+    def write_chunk(self, chunk):
+        rows = np.empty((len(chunk['input_value']), 4), dtype='<f4')
+        for column, name in enumerate(EXPORT_COLUMNS):
+            rows[:, column] = chunk[name]
+        self.file.write(rows.tobytes())
+        return super().write_chunk(chunk)
@@ -0,0 +1,192 @@
+"""
+Opt-in timing of the stages inside get_wheel_angles, for finding out where a control loop latency
+spike comes from on a running rover.
+
+    instrumentation = wheel_angle_calculator.enable_instrumentation()
+    ...
+    print(instrumentation.get_snapshot())
+    print(instrumentation.format_prometheus())
+    wheel_angle_calculator.disable_instrumentation()
+
+Enabling wraps the stage methods of that one calculator instance with timed versions (instance
+attributes shadow the class methods, and the stages call each other through self). Disabling deletes
+the wrappers again, so when it's off the hot path is exactly the uninstrumented code, there isn't even
+a flag check left in it.
+
+Each stage's time is its own (exclusive) time, e.g. 'trig' doesn't include the call to it from
+'angle_clamp', so the stages add up to 'total'. Timing every stage costs a microsecond or so per stage on
+top, which lands in the calling stage's time, so read the numbers relative to each other.
+"""
+import bisect
+import json
+import threading
+import time
+
+
+# calculator method -> stage name
+INSTRUMENTED_STAGES = {
+    'get_wheel_angles': 'input_clamp',  # range clamping, straight ahead checks (and the cache, if any)
+    'get_joystick_direction': 'direction',
+    'get_scaled_center_point_input_from_joystick_input': 'scaling',
+    'get_wheel_angles_from_center_point': 'trig',
+    'get_wheel_angles_for_direction': 'angle_clamp',  # signs and theta_max/phi_max clamping
+    'get_wheel_angles_from_lut': 'lut_lookup',
+}
+# get_wheel_angles including everything it calls
+TOTAL_STAGE = 'total'
+
+# histogram bucket upper bounds in nanoseconds, the last bucket catches everything else
+HISTOGRAM_BUCKETS_NS = [100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 1000000, float('inf')]
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.bucket_counts = [0] * len(HISTOGRAM_BUCKETS_NS)
+        return
+
+    def record(self, elapsed_ns):
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        self.bucket_counts[bisect.bisect_left(HISTOGRAM_BUCKETS_NS, elapsed_ns)] += 1
+        return
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total_ns += other.total_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+        self.bucket_counts = [count + other_count for count, other_count in zip(self.bucket_counts, other.bucket_counts)]
+        return
+
+
+class ThreadStats:
+    """
+    Every thread records into its own stats, so timing a call never waits on a lock.
+    """
+
+    def __init__(self):
+        self.stages = {stage: StageStats() for stage in [TOTAL_STAGE] + list(INSTRUMENTED_STAGES.values())}
+        # time spent in instrumented calls made by the stage currently running
+        self.child_ns = 0
+        return
+
+
+class WheelAnglesInstrumentation:
+    """
+    Per stage call counts and timing histograms for one RoverWheelAngleCalculator. Use
+    RoverWheelAngleCalculator.enable_instrumentation rather than making one directly.
+    """
+
+    def __init__(self, wheel_angle_calculator):
+        self.wheel_angle_calculator = wheel_angle_calculator
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+        return
+
+    def reset(self):
+        with self.lock:
+            self.thread_stats = []
+            # threads start over with fresh stats the next time they record
+            self.local = threading.local()
+        return
+
+    def get_thread_stats(self):
+        thread_stats = ThreadStats()
+        with self.lock:
+            self.thread_stats.append(thread_stats)
+        self.local.stats = thread_stats
+        return thread_stats
+
+    def install(self):
+        for method_name, stage in INSTRUMENTED_STAGES.items():
+            method = getattr(type(self.wheel_angle_calculator), method_name).__get__(self.wheel_angle_calculator)
+            setattr(self.wheel_angle_calculator, method_name, self.wrap(method, stage))
+        return
+
+    def uninstall(self):
+        for method_name in INSTRUMENTED_STAGES:
+            self.wheel_angle_calculator.__dict__.pop(method_name, None)
+        return
+
+    def wrap(self, method, stage):
+        perf_counter_ns = time.perf_counter_ns
+        is_total = method.__name__ == 'get_wheel_angles'
+
+        def timed_method(*args, **kwargs):
+            try:
+                thread_stats = self.local.stats
+            except AttributeError:
+                thread_stats = self.get_thread_stats()
+            outer_child_ns = thread_stats.child_ns
+            thread_stats.child_ns = 0
+            start = perf_counter_ns()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                # recorded even if the stage raised, so the calling stage's exclusive time stays right
+                elapsed_ns = perf_counter_ns() - start
+                thread_stats.stages[stage].record(elapsed_ns - thread_stats.child_ns)
+                thread_stats.child_ns = outer_child_ns + elapsed_ns
+                if is_total:
+                    thread_stats.stages[TOTAL_STAGE].record(elapsed_ns)
+            return result
+        timed_method.__name__ = method.__name__
+        timed_method.__doc__ = method.__doc__
+        return timed_method
+
+    def get_snapshot(self):
+        """
+        :return: dict of stage -> {'calls', 'total_ns', 'mean_ns', 'max_ns', 'buckets'}, where buckets
+            is a list of (upper bound ns, cumulative count) like a Prometheus histogram. Stages that
+            were never called (e.g. lut_lookup with the exact engine) are left out.
+        """
+        stages = ThreadStats().stages
+        with self.lock:
+            for thread_stats in self.thread_stats:
+                for stage, stats in thread_stats.stages.items():
+                    stages[stage].merge(stats)
+        snapshot = {}
+        for stage, stats in stages.items():
+            if not stats.calls:
+                continue
+            cumulative = 0
+            buckets = []
+            for upper_bound, count in zip(HISTOGRAM_BUCKETS_NS, stats.bucket_counts):
+                cumulative += count
+                buckets.append((upper_bound, cumulative))
+            snapshot[stage] = {
+                'calls': stats.calls,
+                'total_ns': stats.total_ns,
+                'mean_ns': stats.total_ns / stats.calls,
+                'max_ns': stats.max_ns,
+                'buckets': buckets,
+            }
+        return snapshot
+
+    def format_json(self):
+        snapshot = self.get_snapshot()
+        for stats in snapshot.values():
+            stats['buckets'] = [['+Inf' if upper_bound == float('inf') else upper_bound, count]
+                                for upper_bound, count in stats['buckets']]
+        return json.dumps(snapshot, indent=2)
+
+    def format_prometheus(self, metric_name='rover_wheel_angles_stage_seconds'):
+        """
+        Snapshot in the Prometheus text exposition format, one histogram labelled by stage.
+        """
+        lines = [
+            f"# HELP {metric_name} Time spent in each stage of get_wheel_angles.",
+            f"# TYPE {metric_name} histogram",
+        ]
+        for stage, stats in self.get_snapshot().items():
+            for upper_bound, count in stats['buckets']:
+                le = '+Inf' if upper_bound == float('inf') else f"{upper_bound / 1e9:g}"
+                lines.append(f'{metric_name}_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{metric_name}_sum{{stage="{stage}"}} {stats["total_ns"] / 1e9:g}')
+            lines.append(f'{metric_name}_count{{stage="{stage}"}} {stats["calls"]}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,131 @@
+"""
+Lookup tables (engine='lut') compiled into binary files that any number of processes can memory-map,
+so they share one physical copy in the page cache and start up without computing anything.
+
+Files are named after a hash of the geometry and lut_resolution (see get_table_path), and the
+geometry is also written into the file header, so a file that doesn't belong to the geometry asking
+for it (renamed, stale, different version) is caught when it's opened instead of serving wrong angles.
+
+File layout, all little endian:
+    4 bytes   magic b'RWAT'
+    uint32    TABLE_FILE_VERSION
+    uint32    header size in bytes
+    header    JSON (geometry, lut_resolution, lut_max_error, and where each side's table starts),
+              padded with spaces to a multiple of 8 bytes
+    float64s  the left then right tables, 4 wheel angles per entry
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+
+TABLE_FILE_MAGIC = b'RWAT'
+# bump whenever the layout or the meaning of the tables changes, old files then stop matching
+TABLE_FILE_VERSION = 1
+TABLE_FILE_EXTENSION = '.rwat'
+_PREAMBLE = struct.Struct('<4sII')
+_DOUBLE_SIZE = 8
+
+
+def get_table_key(geometry, lut_resolution):
+    """
+    Hash of everything the table depends on.
+    :param geometry: RoverGeometry
+    :param lut_resolution:
+    :return: hex string
+    """
+    key_data = {
+        'version': TABLE_FILE_VERSION,
+        'geometry': _get_header_params(geometry),
+        'lut_resolution': lut_resolution,
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def get_table_path(directory, geometry, lut_resolution):
+    return os.path.join(directory, f"wheel_angles_{get_table_key(geometry, lut_resolution)}{TABLE_FILE_EXTENSION}")
+
+
+def _get_header_params(geometry):
+    # through JSON and back, so e.g. the joystick_range tuple compares equal to what is read from a file
+    return json.loads(json.dumps(geometry.get_params()))
+
+
+def write_table_file(path, geometry, lut_resolution, lut, lut_max_error):
+    """
+    Write a lookup table (RoverWheelAngleCalculator.build_wheel_angles_lut) to path. The file is written
+    under a temporary name and moved into place, so other processes never see half a file.
+    :return:
+    """
+    header = {
+        'key': get_table_key(geometry, lut_resolution),
+        'geometry': _get_header_params(geometry),
+        'lut_resolution': lut_resolution,
+        'lut_max_error': lut_max_error,
+        'sides': {},
+    }
+    offset = 0
+    for joystick_direction, side in lut.items():
+        header['sides'][joystick_direction] = {
+            'start': side['start'],
+            'step': side['step'],
+            'offset': offset,
+            'length': len(side['table']),
+        }
+        offset += len(side['table'])
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b' ' * (-(_PREAMBLE.size + len(header_bytes)) % _DOUBLE_SIZE)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(TABLE_FILE_MAGIC, TABLE_FILE_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for side in lut.values():
+            f.write(struct.pack(f"<{len(side['table'])}d", *side['table']))
+    os.replace(temp_path, path)
+    return
+
+
+def read_table_file(path, geometry, lut_resolution):
+    """
+    Memory-map a table file and check it was compiled for this geometry and lut_resolution.
+    :return: (lookup table in the build_wheel_angles_lut format, with memoryviews into the file as
+        the tables, lut_max_error)
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < _PREAMBLE.size:
+        raise Exception(f"Error: '{path}' is not a wheel angles table file.")
+    magic, version, header_size = _PREAMBLE.unpack_from(mapped)
+    if magic != TABLE_FILE_MAGIC:
+        raise Exception(f"Error: '{path}' is not a wheel angles table file.")
+    if version != TABLE_FILE_VERSION:
+        raise Exception(f"Error: '{path}' is table file version {version}, expected {TABLE_FILE_VERSION}. "
+                        f"Delete it so it gets recompiled.")
+    data_start = _PREAMBLE.size + header_size
+    try:
+        header = json.loads(mapped[_PREAMBLE.size:data_start])
+    except ValueError:
+        raise Exception(f"Error: '{path}' is truncated or corrupt, delete it so it gets recompiled.")
+    if (header['geometry'] != _get_header_params(geometry) or header['lut_resolution'] != lut_resolution
+            or header['key'] != get_table_key(geometry, lut_resolution)):
+        raise Exception(f"Error: '{path}' was compiled for {header['geometry']} with lut_resolution "
+                        f"{header['lut_resolution']}, not this geometry. It's stale or misnamed, delete it so it "
+                        f"gets recompiled.")
+    num_doubles = sum(side['length'] for side in header['sides'].values())
+    if len(mapped) != data_start + num_doubles * _DOUBLE_SIZE:
+        raise Exception(f"Error: '{path}' is truncated or corrupt, delete it so it gets recompiled.")
+    # memoryview casts use the native byte order and the file is little endian
+    if sys.byteorder != 'little':
+        raise Exception("Error: memory-mapped table files need a little endian machine.")
+    data = memoryview(mapped)[data_start:].cast('d')
+    lut = {}
+    for joystick_direction, side in header['sides'].items():
+        lut[joystick_direction] = {
+            'start': side['start'],
+            'step': side['step'],
+            'table': data[side['offset']:side['offset'] + side['length']],
+        }
+    return lut, header['lut_max_error']
@@ -0,0 +1,27 @@
+import sys
+sys.path.append('src')
+import random
+import timeit
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+
+# per call latency of get_wheel_angles for 'linear' vs 'log' input scale. The log scale mapping is
+# precomputed in the constructor, so the two should come out about the same.
+NUM_CALLS = 100000
+REPEATS = 5
+
+random.seed(0)
+joystick_vals = [random.uniform(-100, 100) for _ in range(NUM_CALLS)]
+latencies = {}
+for input_scale in ['linear', 'log']:
+    wheel_angle_calculator = RoverWheelAngleCalculator(
+        distance_between_front_wheels=9,
+        distance_between_front_pivots=7,
+        distance_between_axels=10,
+        joystick_range=[-100, 100],
+        input_scale=input_scale
+    )
+    get_wheel_angles = wheel_angle_calculator.get_wheel_angles
+    best = min(timeit.repeat(lambda: [get_wheel_angles(val) for val in joystick_vals], number=1, repeat=REPEATS))
+    latencies[input_scale] = best / NUM_CALLS
+    print(f"{input_scale}: {latencies[input_scale] * 1e9:.0f} ns per call")
+print(f"log / linear: {latencies['log'] / latencies['linear']:.2f}x")
@@ -0,0 +1,198 @@
+import sys
+sys.path.append('src')
+import argparse
+import json
+import os
+import platform
+import random
+import time
+import tracemalloc
+import numpy as np
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+
+# Benchmarks for the steering hot path: per call latency of get_wheel_angles and get_wheel_angles_from_center_point,
+# batch and export throughput, and peak memory of big exports, for a couple of representative rovers.
+#
+#   venv/Scripts/python.exe .\tests\benchmarks.py --output bench.json
+#   venv/Scripts/python.exe .\tests\benchmarks.py --save-baseline bench_baseline.json
+#   venv/Scripts/python.exe .\tests\benchmarks.py --baseline bench_baseline.json --threshold 0.3
+#
+# With --baseline, exits with status 1 if any metric is more than --threshold (a fraction) worse than
+# the baseline. Baselines are machine specific, so save one on the machine you compare on.
+
+GEOMETRIES = {
+    # README example, 10 x 7 rover
+    'readme_10x7': dict(
+        distance_between_front_wheels=7,
+        distance_between_front_pivots=7,
+        distance_between_axels=10,
+        joystick_range=[-100, 100],
+    ),
+    # tests/pygame_example_ui.py rover, 131 x 243.5
+    'pygame_131x243.5': dict(
+        distance_between_front_wheels=243.5,
+        distance_between_front_pivots=243.5,
+        distance_between_axels=131,
+        joystick_range=[-50, 50],
+    ),
+}
+
+# scalar calls timed one by one for the latency percentiles
+NUM_SCALAR_CALLS = 50000
+# joystick values per get_wheel_angles_batch call
+NUM_BATCH_VALUES = 1000000
+# rows in the big export
+NUM_EXPORT_ROWS = 250000
+REPEATS = 3
+
+# True if a bigger number is better for the metric, otherwise smaller is better
+HIGHER_IS_BETTER = {
+    'p50_ns': False,
+    'p99_ns': False,
+    'values_per_s': True,
+    'rows_per_s': True,
+    'peak_memory_mb': False,
+}
+
+
+def bench_scalar_latency(get_wheel_angles, joystick_vals):
+    """
+    :param get_wheel_angles: the scalar function to time, e.g. wheel_angle_calculator.get_wheel_angles
+    :param joystick_vals: list of inputs to call it with, one call each
+    """
+    perf_counter_ns = time.perf_counter_ns
+    # warm up
+    for val in joystick_vals[:1000]:
+        get_wheel_angles(val)
+    latencies = np.empty(len(joystick_vals))
+    p50 = float('inf')
+    p99 = float('inf')
+    # best of a few rounds, so a noisy neighbour on the machine doesn't count as a regression
+    for _ in range(REPEATS):
+        for ix, val in enumerate(joystick_vals):
+            start = perf_counter_ns()
+            get_wheel_angles(val)
+            latencies[ix] = perf_counter_ns() - start
+        p50 = min(p50, float(np.percentile(latencies, 50)))
+        p99 = min(p99, float(np.percentile(latencies, 99)))
+    return {
+        'p50_ns': p50,
+        'p99_ns': p99,
+    }
+
+
+def bench_batch_throughput(wheel_angle_calculator, joystick_vals):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        wheel_angle_calculator.get_wheel_angles_batch(joystick_vals)
+        best = min(best, time.perf_counter() - start)
+    return {'values_per_s': len(joystick_vals) / best}
+
+
+def bench_export(wheel_angle_calculator, output_format):
+    joystick_range = wheel_angle_calculator.joystick_range
+    step = (joystick_range[1] - joystick_range[0]) / NUM_EXPORT_ROWS
+
+    def export():
+        # an open file object rather than the os.devnull path, so the export doesn't print where it saved to
+        if output_format == 'csv':
+            devnull = open(os.devnull, 'w', newline='')
+        else:
+            devnull = open(os.devnull, 'wb')
+        with devnull:
+            wheel_angle_calculator.export_wheel_angles_table(step, output=devnull, output_format=output_format)
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        export()
+        best = min(best, time.perf_counter() - start)
+    # tracemalloc slows everything down a lot, so the memory peak gets its own run
+    tracemalloc.start()
+    export()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'rows_per_s': NUM_EXPORT_ROWS / best,
+        'peak_memory_mb': peak_memory / 1e6,
+    }
+
+
+def run_benchmarks():
+    results = {}
+    for geometry_name, geometry in GEOMETRIES.items():
+        random.seed(0)
+        scalar_vals = [random.uniform(*geometry['joystick_range']) for _ in range(NUM_SCALAR_CALLS)]
+        batch_vals = np.random.default_rng(0).uniform(*geometry['joystick_range'], NUM_BATCH_VALUES)
+        for input_scale in ['linear', 'log']:
+            wheel_angle_calculator = RoverWheelAngleCalculator(input_scale=input_scale, **geometry)
+            results[f"{geometry_name}/{input_scale}/scalar"] = bench_scalar_latency(
+                wheel_angle_calculator.get_wheel_angles, scalar_vals)
+        wheel_angle_calculator = RoverWheelAngleCalculator(engine='lut', **geometry)
+        results[f"{geometry_name}/lut/scalar"] = bench_scalar_latency(wheel_angle_calculator.get_wheel_angles, scalar_vals)
+        wheel_angle_calculator = RoverWheelAngleCalculator(**geometry)
+        # the trig itself, without the joystick scaling, over the practical center point range
+        center_points = [random.uniform(*wheel_angle_calculator.geometry.center_point_range)
+                         for _ in range(NUM_SCALAR_CALLS)]
+        results[f"{geometry_name}/center_point/scalar"] = bench_scalar_latency(
+            wheel_angle_calculator.get_wheel_angles_from_center_point, center_points)
+        results[f"{geometry_name}/linear/batch"] = bench_batch_throughput(wheel_angle_calculator, batch_vals)
+        for output_format in ['csv', 'binary']:
+            results[f"{geometry_name}/linear/export_{output_format}"] = bench_export(wheel_angle_calculator, output_format)
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    :return: list of messages, one per metric that got more than threshold worse than the baseline
+    """
+    regressions = []
+    for bench_name, metrics in baseline['results'].items():
+        for metric, baseline_value in metrics.items():
+            if bench_name not in results or metric not in results[bench_name]:
+                continue
+            value = results[bench_name][metric]
+            if HIGHER_IS_BETTER[metric]:
+                change = (baseline_value - value) / baseline_value
+            else:
+                change = (value - baseline_value) / baseline_value
+            if change > threshold:
+                regressions.append(f"{bench_name} {metric}: {baseline_value:.4g} -> {value:.4g} ({change:.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rover wheel angle calculator.")
+    parser.add_argument('--output', help="save results to this JSON file")
+    parser.add_argument('--save-baseline', help="save results as the baseline JSON file")
+    parser.add_argument('--baseline', help="compare against this baseline JSON file")
+    parser.add_argument('--threshold', type=float, default=0.3, help="allowed regression as a fraction (default 0.3)")
+    args = parser.parse_args()
+
+    results = run_benchmarks()
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'numpy': np.__version__,
+        'results': results,
+    }
+    for bench_name, metrics in results.items():
+        print(bench_name, ', '.join(f"{metric}={value:.4g}" for metric, value in metrics.items()))
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions past {args.threshold:.0%} of the baseline.")
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import sys
+sys.path.append('src')
+import tempfile
+import time
+
+# The steering core has to stay light enough for an embedded controller: importing it and computing
+# angles (exact and memory-mapped lookup table) must only need the standard library. numpy/pandas are
+# for the batch, export and analysis features and get imported when those are first used.
+#
+# Run it in its own interpreter (nothing else imported first), from the repo root:
+#   venv/Scripts/python.exe .\tests\core_import_test.py
+IMPORT_TIME_LIMIT_S = 0.25
+HEAVY_MODULES = ['numpy', 'pandas', 'pyarrow']
+
+start = time.perf_counter()
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+import_time = time.perf_counter() - start
+print(f"Imported rover_wheel_angle_calculator in {import_time * 1000:.1f}ms.")
+assert import_time < IMPORT_TIME_LIMIT_S, f"import took {import_time:.3f}s, limit is {IMPORT_TIME_LIMIT_S}s"
+
+wheel_angle_calculator = RoverWheelAngleCalculator(input_scale='log', cache_size=256)
+for joystick_val in range(-100, 101):
+    wheel_angle_calculator.get_wheel_angles(joystick_val)
+
+# lookup table: built in memory, then with lut_dir (the first one compiles the table file, the second just maps it)
+with tempfile.TemporaryDirectory() as lut_dir:
+    for lut_kwargs in [dict(), dict(lut_dir=lut_dir), dict(lut_dir=lut_dir)]:
+        lut_calculator = RoverWheelAngleCalculator(engine='lut', **lut_kwargs)
+        for joystick_val in range(-100, 101):
+            lut_calculator.get_wheel_angles(joystick_val)
+        print(f"engine='lut' {lut_kwargs}: lut_max_error {lut_calculator.lut_max_error:.4f} degrees.")
+        # release the memory-mapped file so the directory can be removed (Windows)
+        del lut_calculator
+
+loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+assert not loaded, f"steering core imported {loaded}"
+print(f"None of {HEAVY_MODULES} imported by the steering core.")
+
+# the vectorized path still works, it just imports numpy on first use
+print(wheel_angle_calculator.get_wheel_angles_batch([-50, 0, 50]))
+assert 'pandas' not in sys.modules
@@ -0,0 +1,103 @@
+import sys
+sys.path.append('src')
+import argparse
+import numpy as np
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+
+# Accuracy of the float32 batch path (get_wheel_angles_batch(..., dtype=np.float32), and the export table)
+# against the float64 reference, over the whole joystick range of several rovers and both input scales.
+#
+#   venv/Scripts/python.exe .\tests\float32_accuracy_test.py --tolerance 0.01
+#
+# Exits with status 1 if any error is bigger than --tolerance degrees. Servos resolve about 0.1 degree,
+# so the default leaves a 10x margin. The clamped batch angles come in under 1e-4 degrees; the worst are
+# unclamped table angles right where a wheel reaches 90 degrees, which are that sensitive to the joystick
+# value being rounded to float32 at all.
+
+GEOMETRIES = {
+    # constructor defaults
+    'default_9x7': dict(),
+    # README example, 10 x 7 rover
+    'readme_10x7': dict(
+        distance_between_front_wheels=7,
+        distance_between_front_pivots=7,
+        distance_between_axels=10,
+        joystick_range=[-100, 100],
+    ),
+    # tests/pygame_example_ui.py rover, 131 x 243.5
+    'pygame_131x243.5': dict(
+        distance_between_front_wheels=243.5,
+        distance_between_front_pivots=243.5,
+        distance_between_axels=131,
+        joystick_range=[-50, 50],
+    ),
+    # raw 10 bit ADC joystick, midpoint away from 0
+    'adc_0_1023': dict(
+        distance_between_front_wheels=9,
+        distance_between_front_pivots=7,
+        distance_between_axels=10,
+        joystick_range=[0, 1023],
+    ),
+}
+
+DEFAULT_TOLERANCE = 0.01
+DEFAULT_NUM_POINTS = 200001
+
+
+def get_max_errors(wheel_angle_calculator, num_points):
+    """
+    :return: dict of path -> max absolute error in degrees of float32 against float64 (and of an integer
+        joystick grid against the same grid as float64)
+    """
+    joystick_range = wheel_angle_calculator.joystick_range
+    joystick_vals = np.linspace(joystick_range[0], joystick_range[1], num_points)
+    reference = wheel_angle_calculator.get_wheel_angles_batch(joystick_vals)
+    single = wheel_angle_calculator.get_wheel_angles_batch(joystick_vals, dtype=np.float32)
+    assert single.dtype == np.float32
+    table_reference = wheel_angle_calculator.get_wheel_angles_table_batch(joystick_vals)
+    table_single = wheel_angle_calculator.get_wheel_angles_table_batch(joystick_vals.astype(np.float32))
+    # the table angles are what export_wheel_angles_table(dtype=np.float32) writes: unclamped, up to 90
+    # degrees at the tightest turns
+    table_error = max(
+        float(np.max(np.abs(table_single[name].astype(np.float64) - table_reference[name])))
+        for name in ['inner_wheel_angle', 'outer_wheel_angle'])
+    # export_wheel_angles_table and geometry_sweep feed integer grids by default (int joystick_range and step),
+    # those have to give the same angles as the float grid
+    int_joystick_vals = np.arange(int(joystick_range[0]), int(joystick_range[1]) + 1)
+    int_table = wheel_angle_calculator.get_wheel_angles_table_batch(int_joystick_vals)
+    float_table = wheel_angle_calculator.get_wheel_angles_table_batch(int_joystick_vals.astype(np.float64))
+    int_grid_error = max(
+        float(np.max(np.abs(int_table[name] - float_table[name])))
+        for name in ['inner_wheel_angle', 'outer_wheel_angle'])
+    return {
+        'batch': float(np.max(np.abs(single.astype(np.float64) - reference))),
+        'table': table_error,
+        'int_grid': int_grid_error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check float32 wheel angle errors against float64.")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="max error in degrees")
+    parser.add_argument('--num-points', type=int, default=DEFAULT_NUM_POINTS, help="joystick values per rover")
+    args = parser.parse_args()
+
+    failures = []
+    for geometry_name, geometry in GEOMETRIES.items():
+        for input_scale in ['linear', 'log']:
+            wheel_angle_calculator = RoverWheelAngleCalculator(input_scale=input_scale, **geometry)
+            for path, max_error in get_max_errors(wheel_angle_calculator, args.num_points).items():
+                name = f"{geometry_name}/{input_scale}/{path}"
+                print(f"{name}: max error {max_error:.3g} degrees")
+                if not max_error <= args.tolerance:
+                    failures.append(name)
+    for name in failures:
+        print(f"FAILED: {name} is off by more than {args.tolerance} degrees")
+    if failures:
+        sys.exit(1)
+    print(f"float32 is within {args.tolerance} degrees of float64 everywhere.")
+    return
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import sys
+sys.path.append('src')
+import copy
+import pickle
+from rover_geometry import RoverGeometry
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+from fleet_wheel_angle_calculator import FleetWheelAngleCalculator
+
+# Calculators get handed to worker processes (ProcessPoolExecutor, multiprocessing with the spawn start
+# method on Windows), so they have to survive pickle, copy and deepcopy and still compute the same angles.
+#
+#   venv/Scripts/python.exe .\tests\pickle_test.py
+
+JOYSTICK_VALS = [-100, -37.5, 0, 12.25, 100]
+
+
+def round_trips(obj):
+    """
+    :return: list of (name, copy of obj)
+    """
+    return [
+        ('pickle', pickle.loads(pickle.dumps(obj))),
+        ('copy', copy.copy(obj)),
+        ('deepcopy', copy.deepcopy(obj)),
+    ]
+
+
+def check_geometry():
+    geometry = RoverGeometry(distance_between_front_wheels=243.5, distance_between_front_pivots=243.5,
+                             distance_between_axels=131, joystick_range=(-50, 50), input_scale='log')
+    for name, geometry_copy in round_trips(geometry):
+        assert geometry_copy == geometry, name
+        assert geometry_copy.center_point_range == geometry.center_point_range, name
+    print("RoverGeometry survives pickle, copy and deepcopy.")
+    return
+
+
+def check_calculators():
+    calculators = {
+        'exact': RoverWheelAngleCalculator(),
+        'log': RoverWheelAngleCalculator(input_scale='log'),
+        'lut': RoverWheelAngleCalculator(engine='lut'),
+        'cache': RoverWheelAngleCalculator(cache_size=256, cache_quantum=0.5),
+    }
+    for calculator_name, wheel_angle_calculator in calculators.items():
+        expected = [wheel_angle_calculator.get_wheel_angles(joystick_val) for joystick_val in JOYSTICK_VALS]
+        for name, calculator_copy in round_trips(wheel_angle_calculator):
+            actual = [calculator_copy.get_wheel_angles(joystick_val) for joystick_val in JOYSTICK_VALS]
+            assert actual == expected, f"{calculator_name}/{name}"
+            if calculator_copy.wheel_angles_cache is not None and name != 'copy':
+                # the copied cache has its own lock and computes with the copied calculator
+                assert calculator_copy.wheel_angles_cache.lock is not wheel_angle_calculator.wheel_angles_cache.lock
+                assert calculator_copy.wheel_angles_cache.compute.__self__ is calculator_copy
+    print(f"RoverWheelAngleCalculator ({', '.join(calculators)}) survives pickle, copy and deepcopy.")
+    return
+
+
+def check_fleet():
+    fleet = FleetWheelAngleCalculator([RoverGeometry(), RoverGeometry(input_scale='log', joystick_range=(0, 1023))])
+    expected = fleet.get_wheel_angles([-30, 700])
+    for name, fleet_copy in round_trips(fleet):
+        assert (fleet_copy.get_wheel_angles([-30, 700]) == expected).all(), name
+    print("FleetWheelAngleCalculator survives pickle, copy and deepcopy.")
+    return
+
+
+if __name__ == '__main__':
+    check_geometry()
+    check_calculators()
+    check_fleet()
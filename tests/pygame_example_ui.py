@@ -1,6 +1,8 @@
 import sys
 sys.path.append('src')
+import time
 from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+import rover_renderer
 import pygame
 
 RED = (255, 0, 0)
@@ -37,70 +39,21 @@ wheel_angle_calculator = RoverWheelAngleCalculator(
     # [min val, max val]
     joystick_range=[-50, 50],
 
-    # 'linear' for now; 'log' will be enabled in future
+    # 'linear' or 'log'; 'log' for smoothing out angle of wheel turn
     input_scale='linear'
 
 )
 ROVER_SIZE_TO_PIXEL_CONVERSION_SCALAR = 1
-WHEEL_PIXEL_X_TERM = (ROVER_SIZE_TO_PIXEL_CONVERSION_SCALAR * (ROVER_X/2))
-WHEEL_PIXEL_Y_TERM = (ROVER_SIZE_TO_PIXEL_CONVERSION_SCALAR * ROVER_Y)
 
 # completely arbitrary valsfor this UI example
 WHEEL_PIXEL_WIDTH = 20
 WHEEL_PIXEL_HEIGHT = 35
-# pygame rect position definition: Rect(left, top, width, height)
-# going DOWN the screen is positive, don't get confused with screen y axis!
-wheel_positions = [
-    # left_front
-    (
-        SCREEN_CENTER[0] - WHEEL_PIXEL_X_TERM,  # rect leftmost position
-        SCREEN_CENTER[1] - WHEEL_PIXEL_Y_TERM,  # rect topmost position
-        WHEEL_PIXEL_WIDTH,
-        WHEEL_PIXEL_HEIGHT
-    ),
-    # right_front
-    (
-        SCREEN_CENTER[0] + WHEEL_PIXEL_X_TERM,  # rect leftmost position
-        SCREEN_CENTER[1] - WHEEL_PIXEL_Y_TERM,  # rect topmost position
-        WHEEL_PIXEL_WIDTH,
-        WHEEL_PIXEL_HEIGHT
-    ),
-    # left_back
-    (
-        SCREEN_CENTER[0] - WHEEL_PIXEL_X_TERM,  # rect leftmost position
-        SCREEN_CENTER[1] + WHEEL_PIXEL_Y_TERM,  # rect topmost position
-        WHEEL_PIXEL_WIDTH,
-        WHEEL_PIXEL_HEIGHT
-    ),
-    # right_back
-    (
-        SCREEN_CENTER[0] + WHEEL_PIXEL_X_TERM,  # rect leftmost position
-        SCREEN_CENTER[1] + WHEEL_PIXEL_Y_TERM,  # rect topmost position
-        WHEEL_PIXEL_WIDTH,
-        WHEEL_PIXEL_HEIGHT
-    ),
-]
-
-
-def rectRotated(surface, color, pos, fill, border_radius, angle):
-    """
-    https://stackoverflow.com/questions/36510795/rotating-a-rectangle-not-image-in-pygame
-    - angle in degree
-    """
-    max_area = max(pos[2], pos[3])
-    s = pygame.Surface((max_area, max_area))
-    s = s.convert_alpha()
-    s.fill((0, 0, 0, 0))
-    pygame.draw.rect(
-        s,
-        color,
-        (0, 0, pos[2], pos[3]),
-        # fill,
-        border_radius=border_radius
-    )
-    s = pygame.transform.rotate(s, angle)
-    surface.blit(s, (pos[0], pos[1]))
-    return
+# wheel rects in the same wheel order that get_wheel_angles returns angles in
+wheel_positions = rover_renderer.get_wheel_positions(
+    SCREEN_CENTER, ROVER_X, ROVER_Y, WHEEL_PIXEL_WIDTH, WHEEL_PIXEL_HEIGHT, ROVER_SIZE_TO_PIXEL_CONVERSION_SCALAR)
+# rotated wheel sprites are cached, and wheels are only recomputed and redrawn when the slider moves
+rover = rover_renderer.RoverRenderer(window_surface, background, wheel_angle_calculator, wheel_positions)
+frame_time_overlay = rover_renderer.FrameTimeOverlay(window_surface, background)
 
 
 def slider_pixel_x_to_percent(pixel_x_location):
@@ -124,6 +77,11 @@ is_running = True
 offset_x = 0.0
 offset_y = 0.0
 
+# draw the background once, after that only the parts that change get redrawn
+window_surface.blit(background, (0, 0))
+pygame.display.flip()
+slider_drawn_rect = None
+
 while is_running:
     # handle user input
     for event in pygame.event.get():
@@ -150,38 +108,24 @@ while is_running:
                 mouse_x, mouse_y = event.pos
                 slider_rect.x = mouse_x + offset_x
                 # slider_rect.y = mouse_y + offset_y
-    # draw background
-    window_surface.blit(background, (0, 0))
-    # draw rover frame
-
-    # draw joystick slider widget
-    pygame.draw.rect(window_surface, RED, slider_rect)
-    # calculate wheel rotations
-
-    # draw wheels--make sure wheel_positions list is in same wheel order that
-    # wheel_angles list is in!
+    frame_start = time.perf_counter()
+    dirty_rects = []
+    # draw joystick slider widget, if it moved
+    if slider_rect != slider_drawn_rect:
+        if slider_drawn_rect is not None:
+            window_surface.blit(background, slider_drawn_rect, slider_drawn_rect)
+            dirty_rects.append(slider_drawn_rect)
+        pygame.draw.rect(window_surface, RED, slider_rect)
+        slider_drawn_rect = slider_rect.copy()
+        dirty_rects.append(slider_drawn_rect)
+
+    # calculate wheel rotations and draw wheels (nothing happens if the slider didn't move)
     slider_pct = slider_pixel_x_to_percent(slider_rect.x)
-    wheel_angles = wheel_angle_calculator.get_wheel_angles(slider_pct)
-    for wheel_ix, wheel_angle in enumerate(wheel_angles):
-        # flip the rotation of the wheel angle because pygame rotates counter-clockwise
-        # and the RoverWheelAngleCalculator expects clockwise (RoverWheelAngleCalculator
-        # sends negative angle meaning for wheel to rotate left from vertical, pygame
-        # does opposite)
-        wheel_angle *= -1
-        # draw the rect at the specified rotation
-        rectRotated(
-            window_surface,
-            BLACK,  # ignored
-            wheel_positions[wheel_ix],
-            WHITE,
-            2,  # doesn't matter since fill is being ignored
-            wheel_angle
-        )
-        # print(f"{wheel_ix}, {slider_pct}, {wheel_angle}")
-
-    # update screen
-    # pygame.display.update()
-    pygame.display.flip()
+    dirty_rects += rover.render(slider_pct)
+    dirty_rects += frame_time_overlay.render(clock, (time.perf_counter() - frame_start) * 1000)
+
+    # update only the parts of the screen that changed
+    pygame.display.update(dirty_rects)
     clock.tick(FPS)
 
 pygame.quit()
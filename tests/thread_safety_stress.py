@@ -0,0 +1,53 @@
+import sys
+sys.path.append('src')
+import random
+import threading
+from rover_wheel_angle_calculator import RoverWheelAngleCalculator
+
+# Many threads hammering one shared RoverWheelAngleCalculator must get exactly the same wheel angles
+# as computing the same joystick values one after another in a single thread.
+NUM_THREADS = 32
+NUM_CALLS_PER_THREAD = 5000
+
+# make the interpreter switch threads as often as possible to shake out races
+sys.setswitchinterval(1e-6)
+
+# cache_size=256 is smaller than the number of distinct values, so threads also race on evictions
+for cache_size in [None, 256]:
+    for engine in ['exact', 'lut']:
+        for input_scale in ['linear', 'log']:
+            wheel_angle_calculator = RoverWheelAngleCalculator(
+                distance_between_front_wheels=9,
+                distance_between_front_pivots=7,
+                distance_between_axels=10,
+                joystick_range=[-100, 100],
+                input_scale=input_scale,
+                engine=engine,
+                cache_size=cache_size
+            )
+            random.seed(0)
+            # a mix of left, right and center inputs, including out of range ones that get clamped
+            joystick_vals = [random.choice([random.uniform(-110, 110), 0, random.randint(-100, 100)])
+                             for _ in range(NUM_CALLS_PER_THREAD)]
+            expected = [wheel_angle_calculator.get_wheel_angles(val) for val in joystick_vals]
+
+            mismatches = []
+            start_barrier = threading.Barrier(NUM_THREADS)
+
+            def hammer(thread_ix):
+                # each thread walks the values from a different starting point so neighbouring calls differ
+                start_barrier.wait()
+                offset = (thread_ix * 7919) % NUM_CALLS_PER_THREAD
+                for ix in range(NUM_CALLS_PER_THREAD):
+                    val_ix = (ix + offset) % NUM_CALLS_PER_THREAD
+                    wheel_angles = wheel_angle_calculator.get_wheel_angles(joystick_vals[val_ix])
+                    if wheel_angles != expected[val_ix]:
+                        mismatches.append((thread_ix, joystick_vals[val_ix], wheel_angles, expected[val_ix]))
+
+            threads = [threading.Thread(target=hammer, args=(thread_ix,)) for thread_ix in range(NUM_THREADS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert not mismatches, f"{len(mismatches)} mismatches, first: {mismatches[0]}"
+            print(f"{engine}/{input_scale}/cache_size={cache_size}: {NUM_THREADS} threads x {NUM_CALLS_PER_THREAD} calls match serial output.")